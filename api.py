@@ -0,0 +1,251 @@
+import json
+from datetime import datetime
+from functools import wraps
+
+from flask import Blueprint, Response, abort, jsonify, make_response, request, stream_with_context, url_for
+
+from bulk import schedule_shows
+from cache import conditional
+from models import Venue_Genre, Artist_Genre, Venue, Artist, Show
+from queries import venue_directory, show_listing, keyset_page, load_venue_detail, load_artist_detail, \
+    search_by_name, VENUE_FACETS, ARTIST_FACETS, facet_filters, filter_by_facets, venue_version, artist_version, \
+    venues_version, artists_version, shows_version
+from routing import read_only
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+NDJSON = 'application/x-ndjson'
+
+
+# ----------------------------------------------------------------------------#
+# Serializers.
+# ----------------------------------------------------------------------------#
+def isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def venue_summary(row):
+    return {
+        'id': row.id,
+        'name': row.name,
+        'city': row.city,
+        'state': row.state,
+        'num_upcoming_shows': row.num_upcoming_shows,
+    }
+
+
+def artist_summary(row):
+    return {
+        'id': row.id,
+        'name': row.name,
+        'city': row.city,
+        'state': row.state,
+        'upcoming_shows_count': row.upcoming_shows_count,
+    }
+
+
+def show_summary(row):
+    return {
+        'id': row.show_id,
+        'venue_id': row.venue_id,
+        'venue_name': row.venue_name,
+        'artist_id': row.id,
+        'artist_name': row.name,
+        'artist_image_link': row.image_link,
+        'start_time': isoformat(row.start_time),
+    }
+
+
+def profile(entity, seeking, past_shows, upcoming_shows, counterpart):
+    """Fields shared by the venue and artist details; ``counterpart`` serializes a show."""
+    return {
+        'id': entity.id,
+        'name': entity.name,
+        'genres': [genre.name for genre in entity.genres],
+        'address': entity.address,
+        'city': entity.city,
+        'state': entity.state,
+        'phone': entity.phone,
+        'website': entity.web_site,
+        'facebook_link': entity.facebook_link,
+        'seeking': seeking,
+        'seeking_description': entity.seeking_description,
+        'image_link': entity.image_link,
+        'past_shows': [counterpart(show) for show in past_shows],
+        'upcoming_shows': [counterpart(show) for show in upcoming_shows],
+        'past_shows_count': len(past_shows),
+        'upcoming_shows_count': len(upcoming_shows),
+    }
+
+
+def venue_show(show):
+    return {
+        'artist_id': show.artist_shows.id,
+        'artist_name': show.artist_shows.name,
+        'artist_image_link': show.artist_shows.image_link,
+        'start_time': isoformat(show.start_time),
+    }
+
+
+def artist_show(show):
+    return {
+        'venue_id': show.venue_shows.id,
+        'venue_name': show.venue_shows.name,
+        'venue_image_link': show.venue_shows.image_link,
+        'start_time': isoformat(show.start_time),
+    }
+
+
+# ----------------------------------------------------------------------------#
+# Collections.
+# ----------------------------------------------------------------------------#
+def wants_ndjson():
+    if request.args.get('format') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', NDJSON]) == NDJSON
+
+
+def stream_ndjson(query, serialize, batch_size=1000):
+    """Stream every row of ``query`` as one JSON object per line.
+
+    Rows are fetched ``batch_size`` at a time from a server-side cursor where
+    the driver supports one, so memory stays flat however large the export.
+    Each batch goes out as one chunk, so a compressed stream is flushed once
+    per batch rather than once per row.
+    """
+    rows = query.execution_options(stream_results=True).yield_per(batch_size)
+
+    def generate():
+        lines = []
+        for row in rows:
+            lines.append(json.dumps(serialize(row)) + '\n')
+            if len(lines) == batch_size:
+                yield ''.join(lines)
+                lines = []
+        if lines:
+            yield ''.join(lines)
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON)
+
+
+def negotiated(version):
+    """``conditional`` for collections, whose JSON and NDJSON forms share a URL.
+
+    The representation is part of the ETag and responses vary on ``Accept``,
+    so no cache answers a request for one with the other.
+    """
+
+    def representation_version(**kwargs):
+        current = version(**kwargs)
+        if current is None:
+            return None
+        parts, last_modified = current
+        return tuple(parts) + ('ndjson' if wants_ndjson() else 'json',), last_modified
+
+    def decorator(view):
+        view = conditional(representation_version)(view)
+
+        @wraps(view)
+        def wrapper(**kwargs):
+            response = make_response(view(**kwargs))
+            response.vary.add('Accept')
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def collection(query, columns, keys, types, serialize):
+    """A keyset page of ``query`` as JSON, or all of it as NDJSON when asked for.
+
+    The page carries links to the next and previous pages, None at either end.
+    """
+    if wants_ndjson():
+        return stream_ndjson(query.order_by(*columns), serialize)
+    page = keyset_page(query, columns, keys, types)
+    return jsonify({
+        'data': [serialize(row) for row in page['items']],
+        'next': url_for(request.endpoint, after=page['next'], **page['args']) if page['next'] else None,
+        'prev': url_for(request.endpoint, before=page['prev'], **page['args']) if page['prev'] else None,
+    })
+
+
+# ----------------------------------------------------------------------------#
+# Endpoints.
+# ----------------------------------------------------------------------------#
+@api.route('/venues')
+@read_only
+@negotiated(venues_version)
+def venues():
+    query = filter_by_facets(venue_directory(), Venue, Venue_Genre.venue_id, facet_filters(VENUE_FACETS))
+    return collection(query, (Venue.state, Venue.city, Venue.id), ('state', 'city', 'id'), (str, str, int),
+                      venue_summary)
+
+
+@api.route('/venues/<int:venue_id>')
+@read_only
+@conditional(venue_version)
+def get_venue(venue_id):
+    venue, past_shows, upcoming_shows = load_venue_detail(venue_id, datetime.now())
+    return jsonify(profile(venue, venue.seeking_talent, past_shows, upcoming_shows, venue_show))
+
+
+@api.route('/artists')
+@read_only
+@negotiated(artists_version)
+def artists():
+    query = Artist.query.with_entities(Artist.id, Artist.name, Artist.city, Artist.state,
+                                       Artist.upcoming_shows_count)
+    query = filter_by_facets(query, Artist, Artist_Genre.artist_id, facet_filters(ARTIST_FACETS))
+    return collection(query, (Artist.id,), ('id',), (int,), artist_summary)
+
+
+@api.route('/artists/<int:artist_id>')
+@read_only
+@conditional(artist_version)
+def get_artist(artist_id):
+    artist, past_shows, upcoming_shows = load_artist_detail(artist_id, datetime.now())
+    return jsonify(profile(artist, artist.seeking_venue, past_shows, upcoming_shows, artist_show))
+
+
+@api.route('/shows')
+@read_only
+@negotiated(shows_version)
+def shows():
+    return collection(show_listing(), (Show.start_time, Show.id), ('start_time', 'show_id'),
+                      (datetime.fromisoformat, int), show_summary)
+
+
+@api.route('/shows/batch', methods=['POST'])
+def create_shows():
+    records = request.get_json(silent=True)
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        abort(400)
+    results = schedule_shows(records, datetime.now())
+    return jsonify({
+        'created': sum(1 for r in results if r['status'] == 'created'),
+        'results': results,
+    })
+
+
+@api.route('/venues/search')
+@read_only
+def search_venues():
+    query = filter_by_facets(Venue.query, Venue, Venue_Genre.venue_id, facet_filters(VENUE_FACETS))
+    venues = search_by_name(Venue, request.args.get('search_term', ''), query)
+    return jsonify({'count': len(venues), 'data': [{'id': v.id, 'name': v.name} for v in venues]})
+
+
+@api.route('/artists/search')
+@read_only
+def search_artists():
+    query = filter_by_facets(Artist.query, Artist, Artist_Genre.artist_id, facet_filters(ARTIST_FACETS))
+    artists = search_by_name(Artist, request.args.get('search_term', ''), query)
+    return jsonify({'count': len(artists), 'data': [{'id': a.id, 'name': a.name} for a in artists]})
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+    return jsonify({'error': error.name}), error.code
@@ -0,0 +1,228 @@
+"""Bundled, fingerprinted and precompressed static files.
+
+``flask build-assets`` writes every static file and bundle to ``static/dist``
+under a content-hashed name, with ``.gz`` and ``.br`` siblings for text
+files, plus a manifest mapping the plain names to the hashed ones. Templates
+ask for URLs through ``asset_url`` (same arguments as ``url_for``) and
+``bundle_urls``; without a manifest these fall back to the source files, so
+development needs no build.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import Blueprint, abort, current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # .br files are only written when the brotli package is installed
+    brotli = None
+
+BUNDLES = {
+    'main.css': ['css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css', 'css/main.responsive.css',
+                 'css/main.quickfix.css'],
+    # loaded in <head> without defer, as page scripts may call moment
+    'head.js': ['js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js'],
+    'main.js': ['js/libs/jquery-1.11.1.min.js', 'js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js',
+                'js/script.js'],
+}
+DIST = 'dist'
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.eot', '.ttf', '.otf')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+CSS_SKIP = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?\*/)', re.S)
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+SOURCE_MAP = re.compile(r'^\s*//[#@] sourceMappingURL=.*$', re.M)
+
+assets = Blueprint('assets', __name__)
+
+
+# ----------------------------------------------------------------------------#
+# Minify.
+# ----------------------------------------------------------------------------#
+def minify_css(css):
+    """Drop comments (but /*! licenses) and the whitespace CSS does not need.
+
+    Strings are left alone, and no space before a ``:`` is removed since
+    ``a :hover`` and ``a:hover`` are different selectors.
+    """
+    parts = CSS_SKIP.split(css)
+    for i in range(0, len(parts), 2):
+        code = re.sub(r'\s+', ' ', parts[i])
+        code = re.sub(r'\s*([{};,>])\s*', r'\1', code)
+        parts[i] = re.sub(r':\s+', ':', code).replace(';}', '}')
+    for i in range(1, len(parts), 2):
+        if parts[i].startswith('/*') and not parts[i].startswith('/*!'):
+            parts[i] = ''
+    return ''.join(parts).strip()
+
+
+def minify_js(js):
+    """Strip indentation, blank lines and whole-line ``//`` comments.
+
+    Deliberately conservative: nothing inside a line is touched. Files that
+    ship minified are bundled as they are.
+    """
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+# ----------------------------------------------------------------------------#
+# Build.
+# ----------------------------------------------------------------------------#
+def hashed_name(name, content):
+    root, ext = posixpath.splitext(name)
+    return '%s.%s%s' % (root, hashlib.sha1(content).hexdigest()[:12], ext)
+
+
+def static_files(static_folder):
+    """Static files worth publishing, as paths relative to ``static_folder``.
+
+    Source maps, the build output and unminified copies that have a
+    ``.min`` sibling are left out.
+    """
+    for directory, dirs, files in os.walk(static_folder):
+        relative = os.path.relpath(directory, static_folder).replace(os.sep, '/')
+        if relative == DIST:
+            dirs[:] = []
+            continue
+        for file in sorted(files):
+            name = file if relative == '.' else relative + '/' + file
+            root, ext = posixpath.splitext(name)
+            if ext == '.map' or os.path.exists(os.path.join(static_folder, root + '.min' + ext)):
+                continue
+            yield name
+
+
+def rewrite_urls(css, source, manifest):
+    """Point the relative ``url()`` references of ``source`` at their hashed copies.
+
+    Bundles sit at the root of ``dist``, so the new references are relative
+    to it.
+    """
+    def replace(match):
+        ref = match.group(2)
+        if ref.startswith(('data:', 'http:', 'https:', '//', '/')):
+            return match.group(0)
+        path, suffix = re.match(r'([^?#]*)(.*)', ref).groups()
+        name = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+        if name not in manifest:
+            return match.group(0)
+        return 'url("%s%s")' % (manifest[name], suffix)
+
+    return CSS_URL.sub(replace, css)
+
+
+def bundle(name, sources, static_folder, manifest):
+    parts = []
+    for source in sources:
+        with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+            text = SOURCE_MAP.sub('', f.read())
+        if name.endswith('.css'):
+            parts.append(minify_css(rewrite_urls(text, source, manifest)))
+        else:
+            # the semicolon keeps a file without a trailing one from merging into the next
+            parts.append((text if '.min.' in source else minify_js(text)).strip() + '\n;')
+    return '\n'.join(parts).encode('utf-8')
+
+
+def write(dist, name, content):
+    """Write ``content`` and its compressed siblings where they are smaller."""
+    path = os.path.join(dist, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    sizes = {'raw': len(content)}
+    if not name.endswith(COMPRESSIBLE):
+        return sizes
+    compressed = {'gz': gzip.compress(content, 9, mtime=0)}
+    if brotli is not None:
+        compressed['br'] = brotli.compress(content, quality=11)
+    for encoding, data in compressed.items():
+        if len(data) < len(content):
+            with open(path + '.' + encoding, 'wb') as f:
+                f.write(data)
+            sizes[encoding] = len(data)
+    return sizes
+
+
+def build(static_folder):
+    """Write ``static/dist`` and its manifest; return the sizes written per bundle.
+
+    Files of earlier builds are kept, so pages cached or still open from
+    before a release keep loading their assets.
+    """
+    dist = os.path.join(static_folder, DIST)
+    manifest, sizes = {}, {}
+    for name in static_files(static_folder):
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            content = f.read()
+        manifest[name] = hashed_name(name, content)
+        write(dist, manifest[name], content)
+    for name, sources in sorted(BUNDLES.items()):
+        content = bundle(name, sources, static_folder, manifest)
+        manifest[name] = hashed_name(name, content)
+        sizes[name] = write(dist, manifest[name], content)
+    with open(os.path.join(dist, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return sizes
+
+
+# ----------------------------------------------------------------------------#
+# Serve.
+# ----------------------------------------------------------------------------#
+def init_assets(app):
+    """Load the manifest, if built, and register the template helpers."""
+    path = os.path.join(app.static_folder, DIST, 'manifest.json')
+    manifest = None
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+    app.extensions['assets'] = manifest
+    app.jinja_env.globals.update(asset_url=asset_url, bundle_urls=bundle_urls)
+    app.register_blueprint(assets)
+
+
+def asset_url(endpoint, **values):
+    """``url_for``, but static files get their hashed URL once assets are built."""
+    manifest = current_app.extensions.get('assets')
+    if endpoint == 'static' and manifest and values.get('filename') in manifest:
+        values['filename'] = manifest[values['filename']]
+        return url_for('assets.built_file', **values)
+    return url_for(endpoint, **values)
+
+
+def bundle_urls(name):
+    """The URL of bundle ``name``, or of each of its source files before a build."""
+    manifest = current_app.extensions.get('assets')
+    if manifest and name in manifest:
+        return [url_for('assets.built_file', filename=manifest[name])]
+    return [url_for('static', filename=source) for source in BUNDLES[name]]
+
+
+@assets.route('/static/dist/<path:filename>')
+def built_file(filename):
+    """Serve a built file, precompressed when the client accepts it, cached for good."""
+    if filename == 'manifest.json' or filename.endswith(('.gz', '.br')):
+        abort(404)
+    folder = os.path.join(current_app.static_folder, DIST)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    if filename.endswith(COMPRESSIBLE):
+        for candidate in ('br', 'gzip'):
+            suffix = '.br' if candidate == 'br' else '.gz'
+            if request.accept_encodings[candidate] and os.path.exists(os.path.join(folder, filename + suffix)):
+                encoding = candidate
+                filename += suffix
+                break
+    response = send_from_directory(folder, filename, mimetype=mimetype, cache_timeout=31536000)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if filename.endswith(COMPRESSIBLE + ('.gz', '.br')):
+        response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
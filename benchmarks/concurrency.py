@@ -0,0 +1,132 @@
+"""Concurrent detail-page requests against gunicorn, with sync and gevent workers.
+
+Seeds the same catalog as ``benchmarks.routes``, then serves ``wsgi:app``
+with each worker class in turn and keeps ``--concurrency`` requests to random
+venue and artist pages in flight. Reports throughput and p50/p99 latency per
+worker class. The page cache is off, so every request reaches the database.
+
+gevent workers only overlap requests while they wait on the database when the
+driver yields to the hub, i.e. psycopg2 patched by psycogreen. Run against
+PostgreSQL to see the difference; SQLite calls block the whole worker.
+
+Needs the packages in requirements-serve.txt.
+
+    $ python -m benchmarks.concurrency --scale 1k --database postgresql://localhost/fyyur_bench
+    $ python -m benchmarks.concurrency --concurrency 200 --workers 4
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from app import create_app
+from benchmarks.routes import percentile, prepare
+from catalog import SCALES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKERS = {
+    'sync': ['-k', 'sync'],
+    'gevent': ['-k', 'gevent', '--worker-connections', '1000'],
+}
+
+
+# ----------------------------------------------------------------------------#
+# Server.
+# ----------------------------------------------------------------------------#
+def serve(worker_class, workers, port, database):
+    env = dict(os.environ, DATABASE_URL=database, DATABASE_REPLICA_URLS='', CACHE_TYPE='null',
+               SECRET_KEY=os.environ.get('SECRET_KEY', 'benchmark'))
+    return subprocess.Popen([sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', '127.0.0.1:%d' % port,
+                             '--log-level', 'warning'] + WORKERS[worker_class] + ['wsgi:app'], cwd=ROOT, env=env)
+
+
+def wait_until_up(base, server, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            sys.exit('gunicorn exited with status %d' % server.returncode)
+        try:
+            urllib.request.urlopen(base + '/', timeout=1).close()
+            return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    sys.exit('gunicorn did not start within %ds' % timeout)
+
+
+# ----------------------------------------------------------------------------#
+# Load.
+# ----------------------------------------------------------------------------#
+def fetch(url):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=60) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, ConnectionError):
+        status = None
+    return (time.perf_counter() - started) * 1000, status
+
+
+def load(base, scale, requests, concurrency, seed_value):
+    venues, artists, _ = SCALES[scale]
+    rng = random.Random(seed_value)
+    urls = [base + (('/venues/%d' % rng.randint(1, venues)) if n % 2 else ('/artists/%d' % rng.randint(1, artists)))
+            for n in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(fetch, urls))
+    elapsed = time.perf_counter() - started
+    timings = [ms for ms, status in results if status == 200]
+    return {
+        'rps': round(len(timings) / elapsed, 1),
+        'p50': round(percentile(timings, 50), 3) if timings else None,
+        'p99': round(percentile(timings, 99), 3) if timings else None,
+        'errors': len(results) - len(timings),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare sync and gevent workers on concurrent detail pages.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='1k')
+    parser.add_argument('--database', help='Database URL; defaults to a SQLite file per scale in the temp dir.')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes.')
+    parser.add_argument('--concurrency', type=int, default=50, help='Requests kept in flight.')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--worker-class', choices=sorted(WORKERS), action='append',
+                        help='Worker class to run; repeat for several. Defaults to all.')
+    args = parser.parse_args(argv)
+
+    database = args.database or 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyyur_bench_%s.db' % args.scale)
+    prepare(create_app({'SQLALCHEMY_DATABASE_URI': database, 'SQLALCHEMY_REPLICA_URIS': [],
+                        'SLOW_QUERY_LOG': None}), args.scale, args.seed)
+
+    base = 'http://127.0.0.1:%d' % args.port
+    print('%-8s %10s %10s %10s %8s' % ('workers', 'req/s', 'p50 ms', 'p99 ms', 'errors'))
+    failed = False
+    for worker_class in args.worker_class or sorted(WORKERS, reverse=True):
+        server = serve(worker_class, args.workers, args.port, database)
+        try:
+            wait_until_up(base, server)
+            load(base, args.scale, args.concurrency, args.concurrency, args.seed)  # warm up every worker
+            result = load(base, args.scale, args.requests, args.concurrency, args.seed)
+        finally:
+            server.terminate()
+            server.wait()
+        print('%-8s %10.1f %10s %10s %8d' % (worker_class, result['rps'], result['p50'], result['p99'],
+                                             result['errors']))
+        failed = failed or result['errors'] > 0
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""Micro-benchmark of the ``datetime`` template filter.
+
+Compares the old filter, which re-parsed a strftime'd string with dateutil
+and formatted it with ``babel.dates.format_datetime``, with the current one
+on a /shows-like page where many shows share a start time.
+
+    $ python -m benchmarks.datetime_filter
+"""
+import random
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from app import format_datetime, format_datetime_cached
+
+
+def old_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def main(shows=5000, distinct=500, repeat=5):
+    rng = random.Random(0)
+    start = datetime(2030, 1, 1, 20, 0)
+    times = [start + timedelta(hours=rng.randrange(distinct)) for _ in range(shows)]
+    strings = [t.strftime('%Y-%m-%dT%H:%M:%S.%fZ') for t in times]
+    assert [old_format_datetime(s, 'full') for s in strings[:50]] == \
+        [format_datetime(t, 'full') for t in times[:50]]
+
+    def old():
+        for s in strings:
+            old_format_datetime(s, 'full')
+
+    def new():
+        format_datetime_cached.cache_clear()
+        for t in times:
+            format_datetime(t, 'full')
+
+    old_time = min(timeit.repeat(old, number=1, repeat=repeat))
+    new_time = min(timeit.repeat(new, number=1, repeat=repeat))
+    print('%d shows, %d distinct start times' % (shows, distinct))
+    print('dateutil + format_datetime: %8.1f ms' % (old_time * 1000))
+    print('cached pattern + memo:      %8.1f ms' % (new_time * 1000))
+    print('speed-up:                   %8.1fx' % (old_time / new_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""Route benchmarks with query-count budgets and a stored baseline.
+
+Seeds a database at the requested scale (reused on later runs), drives every
+route through the Flask test client and reports p50/p99 latency and the SQL
+statements each request issued (read from the Server-Timing header). Exits
+with status 1 when a route issues more statements than its budget.
+
+Timings depend on the machine, so they are only compared when asked for with
+``--check-latency``, against a baseline saved on the same machine: a route
+then also fails when it is slower than that baseline by more than
+``--tolerance`` (p50) or ``--p99-tolerance``.
+
+    $ python -m benchmarks.routes --scale 1k
+    $ python -m benchmarks.routes --scale 100k --database postgresql://localhost/fyyur_bench
+    $ python -m benchmarks.routes --scale 1k --save-baseline
+    $ python -m benchmarks.routes --scale 1k --check-latency
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app import create_app
+from catalog import SCALES, VENUE_WORDS, ARTIST_WORDS, generate_catalog
+from models import db, Show
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+# ----------------------------------------------------------------------------#
+# Dataset.
+# ----------------------------------------------------------------------------#
+def prepare(app, scale, seed_value):
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            db.create_all()
+        else:
+            from flask_migrate import upgrade
+            upgrade()
+        # benchmarked create handlers add shows after the seeded ids
+        shows = SCALES[scale][2]
+        if Show.query.filter(Show.id <= shows).count() != shows:
+            if Show.query.count():
+                sys.exit('%s already holds a different dataset; use an empty database' % db.engine.url)
+            _, seconds = generate_catalog(*SCALES[scale], seed=seed_value)
+            print('seeded %s in %.1fs' % (scale, seconds))
+
+
+# ----------------------------------------------------------------------------#
+# Routes.
+# ----------------------------------------------------------------------------#
+class Route(object):
+    """A benchmarked request; ``request`` builds (method, url, form data)."""
+
+    def __init__(self, name, request, max_queries):
+        self.name = name
+        self.request = request
+        self.max_queries = max_queries
+
+
+def venue_form(n, rng):
+    return {'name': 'Bench Venue %d' % n, 'city': 'City 1', 'state': 'CA', 'address': '1 Main St',
+            'phone': '555-0000', 'facebook_link': '', 'seeking_talent': 'false', 'seeking_description': '',
+            'image_link': '', 'website_link': '', 'genres': ['Jazz', 'Blues']}
+
+
+def artist_form(n, rng):
+    return {'name': 'Bench Artist %d' % n, 'city': 'City 1', 'state': 'CA', 'address': '1 Main St',
+            'phone': '555-0000', 'facebook_link': '', 'seeking_venue': 'false', 'seeking_description': '',
+            'image_link': '', 'website_link': '', 'genres': ['Pop']}
+
+
+def future(n):
+    return (datetime(2100, 1, 1) + timedelta(seconds=n % 10 ** 9)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def routes(scale):
+    venues, artists, _ = SCALES[scale]
+    return [
+        Route('venues', lambda n, rng: ('GET', '/venues', None), 4),
+        Route('venue', lambda n, rng: ('GET', '/venues/%d' % rng.randint(1, venues), None), 3),
+        Route('artists', lambda n, rng: ('GET', '/artists', None), 4),
+        Route('artist', lambda n, rng: ('GET', '/artists/%d' % rng.randint(1, artists), None), 3),
+        Route('shows', lambda n, rng: ('GET', '/shows', None), 4),
+        Route('search_venues', lambda n, rng: ('GET', '/venues/search?search_term=%s' % rng.choice(VENUE_WORDS[1]),
+                                               None), 2),
+        Route('search_artists', lambda n, rng: ('GET', '/artists/search?search_term=%s' % rng.choice(ARTIST_WORDS[1]),
+                                                None), 2),
+        Route('create_venue', lambda n, rng: ('POST', '/venues/create', venue_form(n, rng)), 4),
+        Route('create_artist', lambda n, rng: ('POST', '/artists/create', artist_form(n, rng)), 4),
+        Route('create_show', lambda n, rng: ('POST', '/shows/create', {
+            'venue_id': rng.randint(1, venues), 'artist_id': rng.randint(1, artists), 'start_time': future(n)}), 7),
+        Route('create_shows_batch', lambda n, rng: ('POST', '/shows/batch', {'shows': '\n'.join(
+            '%d, %d, %s' % (rng.randint(1, venues), rng.randint(1, artists), future(n * 10 + i))
+            for i in range(10))}), 7),
+    ]
+
+
+def statements(response):
+    for value in response.headers.getlist('Server-Timing'):
+        match = re.match(r'db;desc="(\d+) queries"', value)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def run(app, scale, iterations, seed_value):
+    client = app.test_client()
+    rng = random.Random(seed_value)
+    results = {}
+    stamp = int(time.time()) * 1000  # keeps created names and start times unique across runs
+    for route in routes(scale):
+        timings, counts = [], []
+        gc.collect()
+        gc.disable()  # as timeit does, so collections do not land in one route's p99
+        for n in range(iterations + 1):
+            method, url, data = route.request(stamp + n, rng)
+            started = time.perf_counter()
+            response = client.open(url, method=method, data=data)
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                sys.exit('%s %s returned %d' % (method, url, response.status_code))
+            if n:  # the first request warms up caches and connections
+                timings.append(elapsed * 1000)
+                counts.append(statements(response))
+        gc.enable()
+        results[route.name] = {
+            'p50': round(percentile(timings, 50), 3),
+            'p99': round(percentile(timings, 99), 3),
+            'queries': max(counts),
+            'max_queries': route.max_queries,
+        }
+    return results
+
+
+# ----------------------------------------------------------------------------#
+# Report.
+# ----------------------------------------------------------------------------#
+def check(results, baseline, tolerance):
+    """Print the results and return the failed checks.
+
+    ``baseline`` is None when latency is not checked.
+    """
+    failures = []
+    print('%-20s %10s %10s %8s %8s' % ('route', 'p50 ms', 'p99 ms', 'queries', 'budget'))
+    for name, result in results.items():
+        print('%-20s %10.2f %10.2f %8s %8d' % (name, result['p50'], result['p99'], result['queries'],
+                                               result['max_queries']))
+        if result['queries'] is None or result['queries'] > result['max_queries']:
+            failures.append('%s issued %s statements, budget is %d' % (name, result['queries'],
+                                                                        result['max_queries']))
+        previous = baseline.get(name) if baseline is not None else None
+        for p in ('p50', 'p99'):
+            if previous and result[p] > previous[p] * (1 + tolerance[p]):
+                failures.append('%s %s %.2f ms regressed from %.2f ms' % (name, p, result[p], previous[p]))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Fyyur routes.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='1k')
+    parser.add_argument('--database', help='Database URL; defaults to a SQLite file per scale in the temp dir.')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='Allowed p50 slowdown against the baseline, as a fraction.')
+    parser.add_argument('--p99-tolerance', type=float, default=1.0,
+                        help='Allowed p99 slowdown against the baseline, as a fraction.')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline.')
+    parser.add_argument('--check-latency', action='store_true',
+                        help='Also fail on p50/p99 regressions against a baseline saved on this machine.')
+    args = parser.parse_args(argv)
+
+    database = args.database or 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyyur_bench_%s.db' % args.scale)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database, 'SQLALCHEMY_REPLICA_URIS': [], 'CACHE_TYPE': 'null',
+                      'WTF_CSRF_ENABLED': False, 'SERVER_TIMING': True, 'SLOW_QUERY_LOG': None})
+    prepare(app, args.scale, args.seed)
+    results = run(app, args.scale, args.iterations, args.seed)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    baseline = baselines.get(args.scale, {}) if args.check_latency else None
+    failures = check(results, baseline, {'p50': args.tolerance, 'p99': args.p99_tolerance})
+    if args.check_latency and args.scale not in baselines:
+        failures.append('no %s baseline in %s; record one with --save-baseline' % (args.scale, args.baseline))
+    if args.save_baseline:
+        baselines[args.scale] = results
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print('baseline saved to %s' % args.baseline)
+    for failure in failures:
+        print('FAIL ' + failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
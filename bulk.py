@@ -0,0 +1,451 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, MetaData, Table, func, literal, text
+from werkzeug.datastructures import MultiDict
+
+from cache import page_cache
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Genre, Venue_Genre, Artist_Genre, Venue, Artist, Show
+from queries import genre_ids, add_show_counts, recount_shows, refresh_facet_counts, touch
+
+FORMATS = ('csv', 'ndjson')
+
+
+# ----------------------------------------------------------------------------#
+# Entities.
+# ----------------------------------------------------------------------------#
+class Entity(object):
+    """How one kind of record is validated, staged, upserted and exported.
+
+    ``fields`` are the names used in import and export files; they match the
+    form fields so each record is validated by the same form as the web UI.
+    ``columns`` are the table columns a record is staged into. Venues and
+    artists also have a ``seeking`` flag and genre links.
+    """
+
+    def __init__(self, name, model, form, seeking=None, link_model=None, owner_column=None):
+        self.name = name
+        self.model = model
+        self.form = form
+        self.seeking = seeking
+        self.link_model = link_model
+        self.owner_column = owner_column
+        if seeking is None:
+            self.fields = ['id', 'venue_id', 'artist_id', 'start_time']
+            self.columns = ['id', 'venue_id', 'artist_id', 'start_time', 'counted_past']
+        else:
+            self.fields = ['id', 'name', 'city', 'state', 'address', 'phone', 'image_link', 'website_link',
+                           'facebook_link', seeking, 'seeking_description', 'genres']
+            self.columns = ['id', 'name', 'city', 'state', 'address', 'phone', 'image_link', 'web_site',
+                            'facebook_link', seeking, 'seeking_description', 'updated_at']
+
+
+ENTITIES = {
+    'venues': Entity('venues', Venue, VenueForm, 'seeking_talent', Venue_Genre, Venue_Genre.venue_id),
+    'artists': Entity('artists', Artist, ArtistForm, 'seeking_venue', Artist_Genre, Artist_Genre.artist_id),
+    'shows': Entity('shows', Show, ShowForm),
+}
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def form_data(record):
+    """Turn a CSV or NDJSON record into the form data the web UI would post."""
+    data = MultiDict()
+    for key, value in record.items():
+        if key == 'genres':
+            if not isinstance(value, list):
+                value = [name.strip() for name in (value or '').split(',') if name.strip()]
+            data.setlist(key, value)
+        elif isinstance(value, bool):
+            data[key] = 'true' if value else 'false'
+        elif value is not None:
+            data[key] = str(value)
+    return data
+
+
+def to_id(value, field='id', required=True):
+    if value in (None, ''):
+        if required:
+            raise InvalidRecord('%s: This field is required.' % field)
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise InvalidRecord('%s: Not a valid integer.' % field)
+
+
+def validate(entity, record, now):
+    """Validate ``record`` with the entity's form and return its staged row."""
+    if entity.seeking is None and not str(record.get('start_time') or '').strip():
+        # ShowForm defaults start_time to the time it was imported, so check the record itself
+        raise InvalidRecord('start_time: This field is required.')
+    form = entity.form(formdata=form_data(record), meta={'csrf': False})
+    if not form.validate():
+        raise InvalidRecord('; '.join('%s: %s' % (field, ' '.join(errors))
+                                      for field, errors in sorted(form.errors.items())))
+    if entity.seeking is None:
+        return {
+            'id': to_id(record.get('id'), required=False),
+            'venue_id': to_id(form.venue_id.data, 'venue_id'),
+            'artist_id': to_id(form.artist_id.data, 'artist_id'),
+            'start_time': form.start_time.data,
+            'counted_past': form.start_time.data <= now,
+        }, []
+    row = {
+        'id': to_id(record.get('id')),
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'address': form.address.data,
+        'phone': form.phone.data,
+        'image_link': form.image_link.data,
+        'web_site': form.website_link.data,
+        'facebook_link': form.facebook_link.data,
+        entity.seeking: form[entity.seeking].data == 'true',
+        'seeking_description': form.seeking_description.data,
+        'updated_at': datetime.utcnow(),
+    }
+    return row, form.genres.data
+
+
+# ----------------------------------------------------------------------------#
+# Reading and writing files.
+# ----------------------------------------------------------------------------#
+def read_records(stream, fmt):
+    """Yield (line number, record) pairs from a CSV or NDJSON stream, lazily."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError:
+            yield line_no, None
+
+
+def copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value
+
+
+def stage(connection, table, rows):
+    """Load ``rows`` into a staging table, with COPY on Postgres.
+
+    Elsewhere the rows go to the driver's own executemany, converted column by
+    column with the types' bind processors, which skips SQLAlchemy's per-row
+    parameter handling and roughly halves the time.
+    """
+    if not rows:
+        return
+    dialect = connection.dialect
+    if dialect.name != 'postgresql':
+        compiled = table.insert().compile(dialect=dialect)
+        if not compiled.positional:
+            connection.execute(table.insert(), rows)
+            return
+        columns = []
+        for name in compiled.positiontup:
+            process = table.c[name].type.dialect_impl(dialect).bind_processor(dialect)
+            values = [row[name] for row in rows]
+            columns.append(list(map(process, values)) if process else values)
+        cursor = connection.connection.cursor()
+        cursor.executemany(str(compiled), list(zip(*columns)))
+        cursor.close()
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([copy_value(row[c.name]) for c in table.c])
+    buffer.seek(0)
+    names = ', '.join(c.name for c in table.c)
+    cursor = connection.connection.cursor()
+    cursor.copy_expert("COPY %s (%s) FROM STDIN WITH (FORMAT csv, NULL '\\N')" % (table.name, names), buffer)
+    cursor.close()
+
+
+def reset_sequence(connection, table):
+    """Move the Postgres id sequence of ``table`` past rows inserted with explicit ids."""
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text("SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                                "coalesce(max(id), 1)) FROM {table}".format(table=table)))
+
+
+def staging_tables(entity):
+    metadata = MetaData()
+    columns = entity.model.__table__.c
+    staging = Table('staging_' + entity.name, metadata,
+                    *[Column(name, columns[name].type) for name in entity.columns], prefixes=['TEMPORARY'])
+    if entity.link_model is None:
+        return staging, None
+    links = Table('staging_%s_genres' % entity.name, metadata,
+                  Column('owner_id', Integer), Column('genre_id', Integer), prefixes=['TEMPORARY'])
+    return staging, links
+
+
+# ----------------------------------------------------------------------------#
+# Import.
+# ----------------------------------------------------------------------------#
+def upsert(connection, entity, staging, where):
+    table = entity.model.__tablename__
+    names = [c.name for c in staging.c]
+    updates = ', '.join('%s = excluded.%s' % (name, name) for name in names if name != 'id')
+    connection.execute(text('INSERT INTO {table} ({names}) SELECT {names} FROM {staging} WHERE {where} '
+                            'ON CONFLICT (id) DO UPDATE SET {updates}'
+                            .format(table=table, names=', '.join(names), staging=staging.name, where=where,
+                                    updates=updates)))
+
+
+def merge(connection, entity, staging, links):
+    """Move the staged rows into the real tables; return the rows rejected here."""
+    table = entity.model.__tablename__
+    rejected = 0
+    if entity.name == 'shows':
+        rejected = connection.execute(text(
+            'DELETE FROM staging_shows WHERE NOT EXISTS (SELECT 1 FROM venues WHERE venues.id = venue_id) '
+            'OR NOT EXISTS (SELECT 1 FROM artists WHERE artists.id = artist_id)')).rowcount
+        # before the upsert, so the owners a show is moved away from are touched too
+        for owners, column in (('venues', 'venue_id'), ('artists', 'artist_id')):
+            connection.execute(text(
+                'UPDATE {owners} SET updated_at = :now WHERE id IN (SELECT {column} FROM staging_shows '
+                'UNION SELECT {column} FROM shows WHERE id IN (SELECT id FROM staging_shows))'
+                .format(owners=owners, column=column)), now=datetime.utcnow())
+        upsert(connection, entity, staging, 'id IS NOT NULL')
+        names = ', '.join(name for name in entity.columns if name != 'id')
+        connection.execute(text('INSERT INTO shows ({names}) SELECT {names} FROM staging_shows WHERE id IS NULL'
+                                .format(names=names)))
+    else:
+        upsert(connection, entity, staging, 'TRUE')
+        link_table = entity.link_model.__tablename__
+        owner = entity.owner_column.name
+        connection.execute(text('DELETE FROM {links} WHERE {owner} IN (SELECT id FROM {staging})'
+                                .format(links=link_table, owner=owner, staging=staging.name)))
+        connection.execute(text('INSERT INTO {links} ({owner}, genre_id) SELECT DISTINCT owner_id, genre_id '
+                                'FROM {staged}'.format(links=link_table, owner=owner, staged=links.name)))
+    reset_sequence(connection, table)
+    return rejected
+
+
+def import_records(entity, records, on_error=None, batch_size=5000):
+    """Validate, stage and upsert ``records`` in one transaction.
+
+    ``records`` yields (line number, record) pairs and is consumed one batch
+    at a time, so the file is never held in memory. Venues and artists are
+    upserted on their ``id``; shows with an ``id`` are upserted and the rest
+    inserted, and the venues and artists they touch get a new ``updated_at``.
+    A repeated ``id`` is rejected. ``on_error`` is called with the line number and message of each
+    rejected record. Returns (imported, rejected, seconds).
+    """
+    started = time.time()
+    now = datetime.now()
+    connection = db.session.connection()
+    staging, links = staging_tables(entity)
+    staging.create(connection)
+    if links is not None:
+        links.create(connection)
+    known_genres = {}
+    staged = rejected = 0
+    rows, link_rows = [], []
+    seen_ids = set()
+
+    def flush():
+        stage(connection, staging, rows)
+        if links is not None:
+            stage(connection, links, link_rows)
+        del rows[:], link_rows[:]
+
+    for line_no, record in records:
+        try:
+            if not isinstance(record, dict):
+                raise InvalidRecord('not a JSON object')
+            row, genres = validate(entity, record, now)
+            if row['id'] is not None:
+                # ON CONFLICT cannot update the same row twice in one statement
+                if row['id'] in seen_ids:
+                    raise InvalidRecord('id: %d appears more than once in the file.' % row['id'])
+                seen_ids.add(row['id'])
+        except InvalidRecord as e:
+            rejected += 1
+            if on_error is not None:
+                on_error(line_no, str(e))
+            continue
+        missing = [name for name in set(genres) if name not in known_genres]
+        if missing:
+            known_genres.update(zip(missing, genre_ids(missing)))
+        rows.append(row)
+        link_rows.extend({'owner_id': row['id'], 'genre_id': known_genres[name]} for name in genres)
+        staged += 1
+        if len(rows) >= batch_size:
+            flush()
+    flush()
+
+    unmatched = merge(connection, entity, staging, links)
+    if unmatched and on_error is not None:
+        on_error(None, '%d shows reference a venue or artist that does not exist' % unmatched)
+    if entity.name == 'shows':
+        recount_shows()
+    staging.drop(connection)
+    if links is not None:
+        links.drop(connection)
+    db.session.commit()
+    if entity.name != 'shows':
+        refresh_facet_counts()
+    page_cache.clear()
+    return staged - unmatched, rejected + unmatched, time.time() - started
+
+
+# ----------------------------------------------------------------------------#
+# Batch scheduling.
+# ----------------------------------------------------------------------------#
+def missing_owners(rows):
+    """Return the error of each row whose venue or artist does not exist, in one query."""
+    venue_ids = {row['venue_id'] for row in rows}
+    artist_ids = {row['artist_id'] for row in rows}
+    found = set(db.session.query(literal('venue'), Venue.id).filter(Venue.id.in_(venue_ids))
+                .union_all(db.session.query(literal('artist'), Artist.id).filter(Artist.id.in_(artist_ids))))
+    errors = {}
+    for i, row in enumerate(rows):
+        if ('venue', row['venue_id']) not in found:
+            errors[i] = 'venue %d does not exist' % row['venue_id']
+        elif ('artist', row['artist_id']) not in found:
+            errors[i] = 'artist %d does not exist' % row['artist_id']
+    return errors
+
+
+def schedule_shows(records, date_now):
+    """Validate and insert a batch of shows in one transaction.
+
+    ``records`` are dicts with the ShowForm fields. Every referenced venue and
+    artist is checked in one query, and conflicts (the venue or the artist
+    already has a show at that start time, in the database or earlier in the
+    batch) in another, served by the (owner, start_time) indexes. The accepted
+    shows are inserted with one multi-row INSERT.
+
+    Returns one result per record, in order, whose ``status`` is ``created``,
+    ``invalid``, ``unknown`` or ``conflict``, with an ``error`` otherwise.
+    """
+    entity = ENTITIES['shows']
+    results, rows = [], []
+    for record in records:
+        result = {'venue_id': record.get('venue_id'), 'artist_id': record.get('artist_id'),
+                  'start_time': record.get('start_time'), 'status': 'created', 'error': None}
+        try:
+            row, _ = validate(entity, dict(record, id=None), date_now)
+            del row['id']
+            rows.append((result, row))
+        except InvalidRecord as e:
+            result.update(status='invalid', error=str(e))
+        results.append(result)
+    if not rows:
+        return results
+
+    errors = missing_owners([row for _, row in rows])
+    for i, (result, row) in enumerate(rows):
+        if i in errors:
+            result.update(status='unknown', error=errors[i])
+    rows = [(result, row) for i, (result, row) in enumerate(rows) if i not in errors]
+
+    # IN lists on each column rather than row values, so both indexes are searched
+    start_times = {row['start_time'] for _, row in rows}
+    booked_venues, booked_artists = set(), set()
+    if rows:
+        columns = (Show.venue_id, Show.artist_id, Show.start_time)
+        booked = db.session.query(*columns) \
+            .filter(Show.venue_id.in_({row['venue_id'] for _, row in rows}), Show.start_time.in_(start_times)) \
+            .union_all(db.session.query(*columns)
+                       .filter(Show.artist_id.in_({row['artist_id'] for _, row in rows}),
+                               Show.start_time.in_(start_times)))
+        for venue_id, artist_id, start_time in booked:
+            booked_venues.add((venue_id, start_time))
+            booked_artists.add((artist_id, start_time))
+
+    accepted = []
+    for result, row in rows:
+        if (row['venue_id'], row['start_time']) in booked_venues:
+            result.update(status='conflict', error='venue %d already has a show at this time' % row['venue_id'])
+        elif (row['artist_id'], row['start_time']) in booked_artists:
+            result.update(status='conflict', error='artist %d already has a show at this time' % row['artist_id'])
+        else:
+            booked_venues.add((row['venue_id'], row['start_time']))
+            booked_artists.add((row['artist_id'], row['start_time']))
+            accepted.append(row)
+    if not accepted:
+        return results
+
+    db.session.execute(Show.__table__.insert().values(accepted))
+    add_show_counts(accepted)
+    venue_ids = {row['venue_id'] for row in accepted}
+    artist_ids = {row['artist_id'] for row in accepted}
+    touch(Venue, venue_ids)
+    touch(Artist, artist_ids)
+    db.session.commit()
+    page_cache.invalidate('shows', 'venues', *(['venue:%d' % v for v in venue_ids] +
+                                               ['artist:%d' % a for a in artist_ids]))
+    return results
+
+
+# ----------------------------------------------------------------------------#
+# Export.
+# ----------------------------------------------------------------------------#
+def export_query(entity):
+    if entity.name == 'shows':
+        return db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.start_time) \
+            .filter(Show.start_time.isnot(None)).order_by(Show.id)
+    model = entity.model
+    if db.engine.dialect.name == 'postgresql':
+        names = func.string_agg(Genre.name, ',')
+    else:
+        names = func.group_concat(Genre.name, ',')
+    genres = db.session.query(names) \
+        .select_from(entity.link_model).join(Genre, Genre.id == entity.link_model.genre_id) \
+        .filter(entity.owner_column == model.id).correlate(model).as_scalar()
+    return db.session.query(model.id, model.name, model.city, model.state, model.address, model.phone,
+                            model.image_link, model.web_site.label('website_link'), model.facebook_link,
+                            getattr(model, entity.seeking), model.seeking_description, genres.label('genres')) \
+        .order_by(model.id)
+
+
+def export_value(field, value, fmt):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if field == 'genres' and fmt == 'ndjson':
+        return value.split(',') if value else []
+    return value
+
+
+def export_records(entity, stream, fmt, batch_size=1000):
+    """Write every record of ``entity`` to ``stream``, in the import format.
+
+    Rows come from a server-side cursor ``batch_size`` at a time, so memory
+    stays flat. Returns (exported, seconds).
+    """
+    started = time.time()
+    rows = export_query(entity).execution_options(stream_results=True).yield_per(batch_size)
+    writer = None
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=entity.fields)
+        writer.writeheader()
+    exported = 0
+    for row in rows:
+        record = {field: export_value(field, value, fmt) for field, value in zip(entity.fields, row)}
+        if writer is not None:
+            writer.writerow(record)
+        else:
+            stream.write(json.dumps(record) + '\n')
+        exported += 1
+    return exported, time.time() - started
@@ -0,0 +1,249 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+
+from compress import compression, encoded_response
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+# ----------------------------------------------------------------------------#
+# Backends.
+# ----------------------------------------------------------------------------#
+class LRUBackend(object):
+    """In-process cache holding at most ``max_entries`` values.
+
+    Tag versions live outside the LRU so they are never evicted; losing one
+    would make stale pages reachable again.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_versions(self, tags):
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump_version(self, tag):
+        with self._lock:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+class RedisBackend(object):
+    """Cache stored in Redis (or any server speaking its protocol)."""
+
+    def __init__(self, url, prefix='fyyur:'):
+        if redis is None:
+            raise RuntimeError('CACHE_TYPE "redis" requires the redis package')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=int(ttl))
+
+    def get_versions(self, tags):
+        versions = self.client.mget([self.prefix + 'tag:' + tag for tag in tags])
+        return [int(v) if v is not None else 0 for v in versions]
+
+    def bump_version(self, tag):
+        self.client.incr(self.prefix + 'tag:' + tag)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class NullBackend(object):
+    """Backend that never stores anything, used to switch caching off."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def get_versions(self, tags):
+        return [0 for _ in tags]
+
+    def bump_version(self, tag):
+        pass
+
+    def clear(self):
+        pass
+
+
+# ----------------------------------------------------------------------------#
+# Page cache.
+# ----------------------------------------------------------------------------#
+class CacheState(object):
+    """One app's page cache: its backend, default TTL and hit counters."""
+
+    def __init__(self, backend, default_ttl):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+
+
+class PageCache(object):
+    """Caches rendered GET pages, keyed on the request path and query string.
+
+    Every page is cached under one or more tags (e.g. ``venues`` or
+    ``venue:3``). Invalidating a tag bumps its version, which is part of the
+    cache key, so all pages carrying the tag miss on their next request.
+    Each app keeps its own backend in ``app.extensions['page_cache']``, so
+    the methods must run inside an app context.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cache_type = app.config.get('CACHE_TYPE', 'lru')
+        if cache_type == 'lru':
+            backend = LRUBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+        elif cache_type == 'redis':
+            backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        elif cache_type == 'null':
+            backend = NullBackend()
+        else:
+            raise ValueError('Unknown CACHE_TYPE: %s' % cache_type)
+        app.extensions['page_cache'] = CacheState(backend, app.config.get('CACHE_DEFAULT_TTL', 300))
+
+    @property
+    def state(self):
+        return current_app.extensions['page_cache']
+
+    def cached(self, tags, ttl=None):
+        """Cache a view's rendered page.
+
+        ``tags`` is called with the view arguments and returns the tags the
+        page depends on. Only plain string responses are cached, and never
+        while the session has flashed messages waiting to be shown. Under
+        ``conditional`` the ETag is part of the key too, so a page whose
+        version moved without a tag being invalidated (a show starting, a
+        write from another process) is rendered afresh. Clients
+        accepting gzip or Brotli get the page compressed once and cached in
+        that encoding, so hits are never recompressed.
+        """
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                if request.method != 'GET' or session.get('_flashes'):
+                    return view(**kwargs)
+                state = self.state
+                page_tags = tags(**kwargs)
+                versions = state.backend.get_versions(page_tags)
+                encoding = compression.negotiate()
+                key = '%s|%s|%s|%s' % (request.full_path,
+                                       ','.join('%s@%d' % (t, v) for t, v in zip(page_tags, versions)),
+                                       g.get('etag') or '', encoding or 'identity')
+                page = state.backend.get(key)
+                if page is not None:
+                    state.hits += 1
+                    if encoding:
+                        return encoded_response(page, encoding)
+                    return page.decode('utf-8') if isinstance(page, bytes) else page
+                state.misses += 1
+                page = view(**kwargs)
+                if isinstance(page, str):
+                    if encoding:
+                        page = compression.compress(page.encode('utf-8'), encoding)
+                        state.backend.set(key, page, ttl or state.default_ttl)
+                        return encoded_response(page, encoding)
+                    state.backend.set(key, page, ttl or state.default_ttl)
+                return page
+
+            return wrapper
+
+        return decorator
+
+    def invalidate(self, *tags):
+        backend = self.state.backend
+        for tag in tags:
+            backend.bump_version(tag)
+
+    def clear(self):
+        self.state.backend.clear()
+
+    def stats(self):
+        return {'hits': self.state.hits, 'misses': self.state.misses}
+
+
+# ----------------------------------------------------------------------------#
+# Conditional GET.
+# ----------------------------------------------------------------------------#
+def conditional(version):
+    """Answer ``If-None-Match`` with 304 before the view runs.
+
+    ``version`` is called with the view arguments and returns the parts the
+    ETag is built from and the Last-Modified datetime, or None when there is
+    nothing to compare against (the view then runs as usual). Pages rendered
+    with flashed messages get no validators, so they are never revalidated.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            current = version(**kwargs)
+            if current is None or session.get('_flashes'):
+                return view(**kwargs)
+            parts, last_modified = current
+            etag = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+            g.etag = etag  # read by PageCache.cached, so the cached body matches the ETag
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+page_cache = PageCache()
@@ -0,0 +1,233 @@
+"""Deterministic synthetic catalog for load and scale testing.
+
+The same seed, scale and anchor date always produce the same venues, artists,
+genre links and shows. Rows are generated and written one chunk at a time, so
+memory stays flat whatever the scale.
+"""
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from collections import Counter
+from itertools import accumulate
+
+from sqlalchemy import Column, MetaData, Table, bindparam, func
+
+from bulk import reset_sequence, stage
+from cache import page_cache
+from forms import VenueForm
+from models import db, Venue_Genre, Artist_Genre, Venue, Artist, Show
+from queries import genre_ids, refresh_facet_counts
+
+SCALES = {
+    # (venues, artists, shows)
+    '1k': (100, 200, 1000),
+    '100k': (2000, 5000, 100000),
+    '1m': (10000, 20000, 1000000),
+    '10m': (50000, 100000, 10000000),
+}
+STATES = [value for value, _ in VenueForm.state.kwargs['choices']]
+GENRES = [value for value, _ in VenueForm.genres.kwargs['choices']]
+
+# Relative weights; states not listed weigh 1, roughly by live-music market size.
+STATE_WEIGHTS = {'CA': 14, 'NY': 10, 'TX': 9, 'FL': 7, 'IL': 5, 'TN': 5, 'PA': 4, 'WA': 4, 'GA': 4, 'MA': 4,
+                 'OH': 3, 'CO': 3, 'NC': 3, 'MI': 3, 'LA': 3, 'OR': 3, 'MN': 2, 'AZ': 2, 'NJ': 2, 'VA': 2}
+CITIES = ['Springfield', 'Franklin', 'Greenville', 'Clinton', 'Fairview', 'Salem', 'Madison', 'Georgetown',
+          'Arlington', 'Ashland', 'Burlington', 'Manchester', 'Milton', 'Newport', 'Oxford', 'Riverside',
+          'Lexington', 'Dover', 'Hudson', 'Kingston', 'Marion', 'Jackson', 'Auburn', 'Dayton', 'Lancaster']
+VENUE_WORDS = (['The Blue', 'Velvet', 'Golden', 'Rusty', 'Electric', 'Old Town', 'Red', 'Silver', 'Lucky',
+                'Midnight', 'Crooked', 'Union', 'Paper', 'Neon', 'Copper', 'Black Cat'],
+               ['Room', 'Hall', 'Lounge', 'Theatre', 'Club', 'Tavern', 'Ballroom', 'Garage', 'Cellar', 'Stage',
+                'Saloon', 'Social', 'Pavilion', 'Playhouse'])
+ARTIST_WORDS = (['The', 'Little', 'Wild', 'Young', 'Holy', 'Lonesome', 'Broken', 'Northern', 'Cosmic', 'Velvet',
+                 'Electric', 'Quiet', 'Golden', 'Savage', 'Gentle', 'Midnight'],
+                ['Wolves', 'Rivers', 'Engines', 'Pilots', 'Strangers', 'Ghosts', 'Sparrows', 'Machines',
+                 'Kings', 'Lanterns', 'Tigers', 'Drifters', 'Owls', 'Echoes', 'Satellites', 'Horses'])
+# Weekdays run Monday to Sunday; most shows start on the hour between 19:00 and 22:00.
+WEEKDAY_WEIGHTS = [4, 5, 7, 10, 18, 20, 9]
+HOURS = list(range(12, 24))
+HOUR_WEIGHTS = [1, 0, 1, 0, 2, 3, 6, 11, 14, 12, 7, 3]
+MINUTES = [0, 30, 15, 45]
+MINUTE_WEIGHTS = [12, 6, 1, 1]
+PAST_WEEKS = 104
+FUTURE_WEEKS = 52
+
+
+# ----------------------------------------------------------------------------#
+# Distributions.
+# ----------------------------------------------------------------------------#
+def zipf(n, s=1.0):
+    """Cumulative weights of a Zipf distribution over ``n`` ranks."""
+    return list(accumulate(1.0 / (rank + 1) ** s for rank in range(n)))
+
+
+def cumulative(weights):
+    return list(accumulate(weights))
+
+
+def day_weights(first_day, anchor, days):
+    """Weights of each day of the window.
+
+    Shows peak on weekends and in midsummer and dip after the holidays; days
+    after the anchor thin out because fewer shows are announced that far ahead.
+    """
+    weights = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        weight = WEEKDAY_WEIGHTS[day.weekday()] * (
+            1 + 0.35 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 196) / 365.25))
+        if day > anchor:
+            weight *= max(0.1, 1 - (day - anchor).days / (7.0 * FUTURE_WEEKS))
+        weights.append(weight)
+    return weights
+
+
+def chunks(total, size):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+
+# ----------------------------------------------------------------------------#
+# Rows.
+# ----------------------------------------------------------------------------#
+def profile_rows(rng, kind, words, seeking, first_id, count, size, updated_at):
+    """Chunks of venue or artist rows, with their (owner id, genre index) links.
+
+    Each column is drawn for the whole chunk with one ``choices`` call, which
+    is several times faster than drawing row by row.
+    """
+    state_weights = cumulative(STATE_WEIGHTS.get(s, 1) for s in STATES)
+    # each state ranks the city names differently, so CA's biggest city is not TX's
+    city_offsets = {state: i * 7 for i, state in enumerate(STATES)}
+    city_weights = zipf(len(CITIES), 1.2)
+    genre_weights = zipf(len(GENRES), 0.8)
+    for start, n in chunks(count, size):
+        rows, links = [], []
+        columns = zip(range(first_id + start, first_id + start + n),
+                      rng.choices(STATES, cum_weights=state_weights, k=n),
+                      rng.choices(range(len(CITIES)), cum_weights=city_weights, k=n),
+                      rng.choices(words[0], k=n), rng.choices(words[1], k=n),
+                      rng.choices(range(1, 10000), k=n), rng.choices(CITIES, k=n),
+                      rng.choices(range(200, 1000), k=n), rng.choices(range(10000000), k=n),
+                      rng.choices((1, 2, 3), k=n), rng.choices((True, False), (3, 7), k=n))
+        genre_picks = iter(rng.choices(range(len(GENRES)), cum_weights=genre_weights, k=3 * n))
+        for owner_id, state, city, first, second, number, street, area, line, genre_count, is_seeking in columns:
+            genres = {next(genre_picks) for _ in range(genre_count)}
+            rows.append({
+                'id': owner_id,
+                'name': '%s %s' % (first, second),
+                'city': CITIES[(city + city_offsets[state]) % len(CITIES)],
+                'state': state,
+                'address': '%d %s St' % (number, street),
+                'phone': '%03d-%03d-%04d' % (area, line // 10000, line % 10000),
+                'image_link': 'https://picsum.photos/seed/%s%d/400/400' % (kind, owner_id),
+                'web_site': 'https://example.com/%s/%d' % (kind, owner_id),
+                'facebook_link': 'https://www.facebook.com/%s%d' % (kind, owner_id),
+                seeking: is_seeking,
+                'seeking_description': 'Looking for %s acts' % GENRES[min(genres)] if is_seeking else '',
+                'updated_at': updated_at,
+            })
+            links.extend((owner_id, g) for g in genres)
+        yield rows, links
+
+
+def show_rows(rng, anchor, venues, artists, first_id, count, size):
+    """Chunks of show rows; popular venues and artists get most of the shows."""
+    first_day = anchor - timedelta(days=anchor.weekday(), weeks=PAST_WEEKS)
+    days = 7 * (PAST_WEEKS + FUTURE_WEEKS)
+    slots = [timedelta(hours=h, minutes=m) for h in HOURS for m in MINUTES]
+    slot_weights = [h * m for h in HOUR_WEIGHTS for m in MINUTE_WEIGHTS]
+    # every possible start time with its weight, so a row costs one lookup instead of date arithmetic
+    start_times = [first_day + timedelta(days=d) + slot for d in range(days) for slot in slots]
+    counted_past = [start_time <= anchor for start_time in start_times]
+    time_weights = list(accumulate(day * slot for day in day_weights(first_day, anchor, days)
+                                   for slot in slot_weights))
+    venue_weights = zipf(len(venues), 0.8)
+    artist_weights = zipf(len(artists), 0.9)
+    for start, n in chunks(count, size):
+        columns = zip(range(first_id + start, first_id + start + n),
+                      rng.choices(venues, cum_weights=venue_weights, k=n),
+                      rng.choices(artists, cum_weights=artist_weights, k=n),
+                      rng.choices(range(len(start_times)), cum_weights=time_weights, k=n))
+        rows = [{'id': show_id, 'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_times[t],
+                 'counted_past': counted_past[t]} for show_id, venue_id, artist_id, t in columns]
+        yield rows
+
+
+# ----------------------------------------------------------------------------#
+# Writer.
+# ----------------------------------------------------------------------------#
+def target(model, names):
+    """``model``'s table reduced to ``names``, so COPY lists only generated columns."""
+    columns = model.__table__.c
+    return Table(model.__tablename__, MetaData(), *[Column(name, columns[name].type) for name in names])
+
+
+def next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def generate_catalog(venues, artists, shows, seed=0, anchor=None, chunk_size=50000, progress=None):
+    """Write a synthetic catalog and return the rows written per table and the seconds taken.
+
+    Rows are added after the existing ones; on an empty database the ids,
+    names and start times depend only on the arguments. Shows spread over the
+    two years before ``anchor`` (default today) and the year after it.
+    ``progress`` is called with the table name and rows written after every
+    chunk. Everything is committed in one transaction.
+    """
+    started = time.time()
+    rng = random.Random(seed)
+    anchor = anchor or datetime.combine(datetime.now().date(), datetime.min.time())
+    updated_at = datetime.utcnow()
+    connection = db.session.connection()
+    genres = genre_ids(GENRES)
+    written = {}
+
+    def write(table, rows):
+        stage(connection, table, rows)
+        written[table.name] = written.get(table.name, 0) + len(rows)
+        if progress is not None:
+            progress(table.name, written[table.name])
+
+    owner_ids = {}
+    for model, kind, words, seeking, link_model, owner_column, count in (
+            (Venue, 'venue', VENUE_WORDS, 'seeking_talent', Venue_Genre, 'venue_id', venues),
+            (Artist, 'artist', ARTIST_WORDS, 'seeking_venue', Artist_Genre, 'artist_id', artists)):
+        first_id = next_id(model)
+        table = target(model, ['id', 'name', 'city', 'state', 'address', 'phone', 'image_link', 'web_site',
+                               'facebook_link', seeking, 'seeking_description', 'updated_at'])
+        links = target(link_model, [owner_column, 'genre_id'])
+        for rows, link_rows in profile_rows(rng, kind, words, seeking, first_id, count, chunk_size, updated_at):
+            write(table, rows)
+            write(links, [{owner_column: owner_id, 'genre_id': genres[g]} for owner_id, g in link_rows])
+        reset_sequence(connection, table.name)
+        owner_ids[kind] = range(first_id, first_id + count)
+
+    if shows and venues and artists:
+        first_id = next_id(Show)
+        table = target(Show, ['id', 'venue_id', 'artist_id', 'start_time', 'counted_past'])
+        # into an empty table, building the indexes once afterwards beats updating them row by row
+        indexes = Show.__table__.indexes if first_id == 1 else set()
+        for index in indexes:
+            index.drop(connection)
+        # the shows only reference the venues and artists generated above, so their
+        # counters are tallied here instead of recounted from the shows table
+        counts = {'venue_id': Counter(), 'artist_id': Counter()}
+        for rows in show_rows(rng, anchor, owner_ids['venue'], owner_ids['artist'], first_id, shows, chunk_size):
+            write(table, rows)
+            for owner_column, counter in counts.items():
+                counter.update((row[owner_column], row['counted_past']) for row in rows)
+        for index in indexes:
+            index.create(connection)
+        reset_sequence(connection, table.name)
+        for model, owner_column, kind in ((Venue, 'venue_id', 'venue'), (Artist, 'artist_id', 'artist')):
+            counter = counts[owner_column]
+            connection.execute(model.__table__.update().where(model.id == bindparam('owner_id')).values(
+                upcoming_shows_count=bindparam('upcoming'), past_shows_count=bindparam('past')),
+                [{'owner_id': owner_id, 'upcoming': counter[owner_id, False], 'past': counter[owner_id, True]}
+                 for owner_id in owner_ids[kind] if counter[owner_id, False] or counter[owner_id, True]])
+    db.session.commit()
+    refresh_facet_counts()
+    page_cache.clear()
+    return written, time.time() - started
@@ -0,0 +1,238 @@
+import re
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+from flask_migrate import upgrade
+from sqlalchemy import event, func
+from sqlalchemy_utils import database_exists, create_database
+from werkzeug.exceptions import NotFound
+
+import assets
+from bulk import ENTITIES, FORMATS, export_records, import_records, read_records
+from catalog import SCALES, generate_catalog
+from models import db, Artist, Artist_Genre, Show, Venue, Venue_Genre
+from queries import ARTIST_FACETS, VENUE_FACETS, artist_version, artists_version, facet_sidebar, \
+    filter_by_facets, keyset_page, load_artist_detail, load_venue_detail, refresh_facet_counts, \
+    roll_show_counters, search_by_name, show_listing, shows_version, venue_directory, venue_version, \
+    venues_version
+
+# a table read in full: Postgres "Seq Scan on t", SQLite "SCAN t" / "SCAN TABLE t" without an index
+SEQ_SCAN = re.compile(r'Seq Scan on (\w+)|^\s*SCAN (?:TABLE )?(\w+)')
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db():
+    """Create the database if it does not exist and apply all migrations."""
+    if not database_exists(db.engine.url):
+        create_database(db.engine.url)
+    upgrade()
+    click.echo('Database is up to date')
+
+
+@click.command('refresh-facets')
+@with_appcontext
+def refresh_facets():
+    """Rebuild the facet counts shown on listing and search pages."""
+    click.echo('%d facet counts refreshed' % refresh_facet_counts())
+
+
+@click.command('roll-show-counters')
+@with_appcontext
+def roll_counters():
+    """Move shows that have started from upcoming to past in the show counters.
+
+    Schedule it every few minutes, e.g. from cron; the directory shows a
+    venue's upcoming count as of the last run.
+    """
+    click.echo('%d shows rolled over to past' % roll_show_counters(datetime.now()))
+
+
+data_cli = AppGroup('data', help='Bulk import and export of venues, artists and shows.')
+
+
+def file_format(fmt, file):
+    if fmt is None:
+        fmt = 'ndjson' if file.name.endswith(('.ndjson', '.jsonl')) else 'csv'
+    return fmt
+
+
+@data_cli.command('import')
+@click.argument('entity', type=click.Choice(sorted(ENTITIES)))
+@click.argument('file', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Defaults to the file extension, else csv.')
+@click.option('--batch-size', default=5000, show_default=True, help='Records staged per COPY or executemany.')
+def import_data(entity, file, fmt, batch_size):
+    """Validate and upsert ENTITY records from FILE ("-" for stdin).
+
+    Records use the fields of the web forms plus ``id``. Venues and artists
+    are upserted on ``id``, so import them before the shows that reference
+    them. Nothing is written unless the whole file is processed.
+    """
+    errors = 0
+
+    def on_error(line_no, message):
+        nonlocal errors
+        errors += 1
+        if errors <= 20:
+            click.echo('%s: %s' % ('line %d' % line_no if line_no else file.name, message), err=True)
+
+    imported, rejected, seconds = import_records(ENTITIES[entity], read_records(file, file_format(fmt, file)),
+                                                 on_error, batch_size)
+    if errors > 20:
+        click.echo('... %d more errors' % (errors - 20), err=True)
+    click.echo('%d %s imported, %d rejected in %.1fs (%d rows/s)'
+               % (imported, entity, rejected, seconds, (imported + rejected) / max(seconds, 1e-6)))
+
+
+@data_cli.command('export')
+@click.argument('entity', type=click.Choice(sorted(ENTITIES)))
+@click.argument('file', type=click.File('w', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Defaults to the file extension, else csv.')
+def export_data(entity, file, fmt):
+    """Stream every ENTITY record to FILE ("-" for stdout) in the import format."""
+    exported, seconds = export_records(ENTITIES[entity], file, file_format(fmt, file))
+    click.echo('%d %s exported in %.1fs (%d rows/s)' % (exported, entity, seconds, exported / max(seconds, 1e-6)),
+               err=file.name == '<stdout>')
+
+
+@click.command('generate-catalog')
+@click.option('--scale', type=click.Choice(sorted(SCALES, key=lambda s: SCALES[s])), default='1k',
+              show_default=True, help='Preset numbers of venues, artists and shows.')
+@click.option('--venues', type=int, help='Overrides the venues of the scale.')
+@click.option('--artists', type=int, help='Overrides the artists of the scale.')
+@click.option('--shows', type=int, help='Overrides the shows of the scale.')
+@click.option('--seed', default=0, show_default=True, help='Same seed, same catalog.')
+@click.option('--anchor', type=click.DateTime(['%Y-%m-%d']),
+              help='Date the shows are spread around; defaults to today. Fix it for identical start times.')
+@click.option('--chunk-size', default=50000, show_default=True, help='Rows generated and written per COPY.')
+@with_appcontext
+def generate_catalog_command(scale, venues, artists, shows, seed, anchor, chunk_size):
+    """Add a synthetic catalog of venues, artists and shows for load testing.
+
+    Venues and artists spread over the form's states and genres; shows fall
+    mostly on weekend evenings over the two years before the anchor date and
+    the year after it. Run roll-show-counters afterwards when the anchor is in
+    the past.
+    """
+    default_venues, default_artists, default_shows = SCALES[scale]
+
+    def progress(table, rows):
+        click.echo('\r%-14s %10d rows' % (table, rows), nl=False, err=True)
+
+    written, seconds = generate_catalog(venues if venues is not None else default_venues,
+                                        artists if artists is not None else default_artists,
+                                        shows if shows is not None else default_shows,
+                                        seed, anchor, chunk_size, progress)
+    click.echo('', err=True)
+    total = sum(written.values())
+    click.echo('%s written in %.1fs (%d rows/s)' % (', '.join('%d %s' % (n, table) for table, n in written.items()),
+                                                    seconds, total / max(seconds, 1e-6)))
+
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets():
+    """Bundle, fingerprint and precompress the static files into static/dist.
+
+    Run it on every release; restart the app afterwards so it loads the new
+    manifest.
+    """
+    for name, sizes in assets.build(current_app.static_folder).items():
+        click.echo('%-10s %s' % (name, ', '.join('%s %d bytes' % size for size in sizes.items())))
+
+
+def hot_queries(date_now):
+    """Name and callable of each hot page's queries, run through the functions the views use."""
+    venue_id = db.session.query(func.min(Venue.id)).scalar() or 0
+    artist_id = db.session.query(func.min(Artist.id)).scalar() or 0
+    return [
+        ('venue directory', lambda: (
+            venues_version(), facet_sidebar('venue', VENUE_FACETS, {}),
+            keyset_page(filter_by_facets(venue_directory(), Venue, Venue_Genre.venue_id, {}),
+                        (Venue.state, Venue.city, Venue.id), ('state', 'city', 'id'), (str, str, int)))),
+        ('artist directory', lambda: (
+            artists_version(), facet_sidebar('artist', ARTIST_FACETS, {}),
+            keyset_page(filter_by_facets(Artist.query.with_entities(Artist.id, Artist.name), Artist,
+                                         Artist_Genre.artist_id, {}), (Artist.id,), ('id',), (int,)))),
+        ('shows listing', lambda: (
+            shows_version(),
+            keyset_page(show_listing(), (Show.start_time, Show.id), ('start_time', 'show_id'),
+                        (datetime.fromisoformat, int)))),
+        ('venue detail', lambda: (venue_version(venue_id), load_venue_detail(venue_id, date_now))),
+        ('artist detail', lambda: (artist_version(artist_id), load_artist_detail(artist_id, date_now))),
+        ('venue search', lambda: search_by_name(Venue, 'the')),
+        ('artist search', lambda: search_by_name(Artist, 'the')),
+    ]
+
+
+def captured_statements(run):
+    """Run ``run`` and return the (statement, parameters) it sent to the database."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        with current_app.test_request_context():
+            run()
+    except NotFound:
+        pass  # an empty table; the lookup itself was captured
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    return statements
+
+
+def seq_scans(statement, plan, large_tables):
+    """The large tables ``plan`` reads with a sequential scan.
+
+    SQLite also reports a walk of the table in primary key order as a SCAN;
+    with a LIMIT and no sort that walk stops early, so it is not counted.
+    """
+    if 'LIMIT' in statement and not any(line.startswith('USE TEMP B-TREE FOR ORDER BY') for line in plan):
+        plan = [line for line in plan if not line.lstrip().startswith('SCAN ')]
+    found = set()
+    for line in plan:
+        match = SEQ_SCAN.search(line)
+        if match and 'USING' not in line:
+            table = match.group(1) or match.group(2)
+            table = table if table in large_tables else re.sub(r'_\d+$', '', table)  # SQLite shows aliases
+            if table in large_tables:
+                found.add(table)
+    return found
+
+
+@click.command('explain')
+@click.option('--min-rows', default=10000, show_default=True,
+              help='Tables with at least this many rows must not be read with a sequential scan.')
+@with_appcontext
+def explain_hot_queries(min_rows):
+    """Print the query plans of the hot listing, detail and search pages.
+
+    The statements are the ones the page's query functions send, captured as
+    they run. Exits with status 1 when a plan scans a table of at least
+    MIN_ROWS rows sequentially, so it can gate a release.
+    """
+    large_tables = {table.name for table in db.metadata.sorted_tables
+                    if db.session.query(func.count()).select_from(table).scalar() >= min_rows}
+    prefix = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    failures = []
+    for name, run in hot_queries(datetime.now()):
+        click.echo('== %s' % name)
+        for statement, parameters in captured_statements(run):
+            cursor = db.session.connection().connection.cursor()
+            cursor.execute(prefix + statement, parameters)
+            plan = [str(row[-1]) for row in cursor.fetchall()]
+            cursor.close()
+            scanned = seq_scans(statement, plan, large_tables)
+            click.echo('-- %s%s' % (' '.join(statement.split())[:100],
+                                    ' (sequential scan on %s!)' % ', '.join(sorted(scanned)) if scanned else ''))
+            for line in plan:
+                click.echo('   ' + line)
+            failures.extend('%s: %s' % (name, table) for table in sorted(scanned))
+    db.session.rollback()
+    if failures:
+        raise click.ClickException('sequential scans on large tables: ' + '; '.join(failures))
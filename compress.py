@@ -0,0 +1,147 @@
+import gzip
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # only gzip is offered without the brotli package
+    brotli = None
+
+COMPRESSIBLE = ('text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript', 'application/javascript',
+                'application/json', 'application/x-ndjson', 'application/xml', 'image/svg+xml')
+
+
+class CompressionSettings(object):
+    """One app's COMPRESS_* settings."""
+
+    def __init__(self, enabled=False, min_size=500, level=6, br_quality=4):
+        self.enabled = enabled
+        self.min_size = min_size
+        self.level = level
+        self.br_quality = br_quality
+
+
+class Compression(object):
+    """gzip or Brotli compression of responses, negotiated on ``Accept-Encoding``.
+
+    Only the COMPRESSIBLE content types are compressed, so images, fonts and
+    archives, which are compressed already, pass through untouched, as does
+    any response that already has a Content-Encoding. Bodies shorter than
+    COMPRESS_MIN_SIZE are sent as they are; pages from the page cache are
+    compressed whatever their size, as that happens only once. Streamed
+    responses are compressed chunk by chunk and flushed after each one, so
+    clients still receive every chunk as soon as it is produced. Each app's
+    settings live in ``app.extensions['compression']``; apps that never
+    called ``init_app`` are not compressed.
+    """
+
+    def init_app(self, app):
+        app.extensions['compression'] = CompressionSettings(
+            enabled=app.config.get('COMPRESS', True),
+            min_size=app.config.get('COMPRESS_MIN_SIZE', 500),
+            level=app.config.get('COMPRESS_LEVEL', 6),
+            br_quality=app.config.get('COMPRESS_BR_QUALITY', 4))
+        app.after_request(self._compress)
+
+    @property
+    def settings(self):
+        return current_app.extensions.get('compression') or DISABLED
+
+    def negotiate(self):
+        """The encoding to use for this request: 'br', 'gzip' or None."""
+        if not self.settings.enabled:
+            return None
+        accepted = request.accept_encodings
+        br, gz = (accepted['br'] if brotli is not None else 0), accepted['gzip']
+        if br and br >= gz:
+            return 'br'
+        return 'gzip' if gz else None
+
+    def compress(self, data, encoding):
+        settings = self.settings
+        if encoding == 'br':
+            return brotli.compress(data, quality=settings.br_quality)
+        return gzip.compress(data, settings.level, mtime=0)
+
+    def compressor(self, encoding):
+        """A function compressing one chunk of a stream; called with None it ends the stream."""
+        settings = self.settings
+        if encoding == 'br':
+            stream = brotli.Compressor(quality=settings.br_quality)
+
+            def compress_chunk(chunk):
+                if chunk is None:
+                    return stream.finish()
+                return stream.process(chunk) + stream.flush()
+        else:
+            stream = zlib.compressobj(settings.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+            def compress_chunk(chunk):
+                if chunk is None:
+                    return stream.flush()
+                return stream.compress(chunk) + stream.flush(zlib.Z_SYNC_FLUSH)
+
+        return compress_chunk
+
+    def _compress(self, response):
+        if response.mimetype not in COMPRESSIBLE or response.direct_passthrough:
+            return response
+        response.vary.add('Accept-Encoding')
+        if 'Content-Encoding' in response.headers:
+            mark_encoded(response)
+            return response
+        encoding = self.negotiate()
+        if encoding is not None and response.status_code == 304:
+            mark_encoded(response)  # the ETag must match the one sent with the encoded 200
+            return response
+        if (encoding is None or request.method == 'HEAD' or response.status_code < 200
+                or response.status_code == 204 or 'no-transform' in response.headers.get('Cache-Control', '')):
+            return response
+        if response.is_streamed:
+            response.response = compress_stream(response.iter_encoded(), self.compressor(encoding),
+                                                response.response)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.settings.min_size:
+                return response
+            response.set_data(self.compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        mark_encoded(response)
+        return response
+
+
+def compress_stream(chunks, compress_chunk, source):
+    """Compress ``chunks``; ``source`` is closed at the end, as the server would have."""
+    try:
+        for chunk in chunks:
+            data = compress_chunk(chunk)
+            if data:
+                yield data
+        yield compress_chunk(None)
+    finally:
+        if hasattr(source, 'close'):
+            source.close()
+
+
+def mark_encoded(response):
+    """Weaken a strong ETag, since the encoded bytes differ from the plain ones.
+
+    ``conditional`` compares ETags weakly, so revalidation keeps working.
+    """
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def encoded_response(body, encoding, mimetype='text/html'):
+    """A response for ``body``, already compressed with ``encoding``."""
+    response = current_app.response_class(body, mimetype=mimetype)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+DISABLED = CompressionSettings()
+compression = Compression()
@@ -5,11 +5,15 @@ from fabric.contrib.console import confirm
 
 
 def test():
+    with settings(warn_only=True):
+        result = local("python -m pytest tests", capture=True)
+    if result.failed and not confirm("Tests failed. Continue?"):
+        abort("Aborted at user request.")
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python -m benchmarks.routes --scale 1k", capture=True
         )
-    if result.failed and not confirm("Tests failed. Continue?"):
+    if result.failed and not confirm("Benchmarks failed. Continue?"):
         abort("Aborted at user request.")
 
 
@@ -40,7 +44,7 @@ def heroku():
 
 def heroku_test():
     local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
+        "heroku run python -m benchmarks.routes --scale 1k"
     )
 
 
@@ -18,6 +18,12 @@ class ShowForm(Form):
     )
 
 
+class ShowBatchForm(Form):
+    shows = TextAreaField(
+        'shows', validators=[DataRequired()]
+    )
+
+
 class VenueForm(Form):
     name = StringField(
         'name', validators=[DataRequired()]
@@ -0,0 +1,257 @@
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+
+# ----------------------------------------------------------------------------#
+# Connection pool.
+# ----------------------------------------------------------------------------#
+class PoolMetrics(object):
+    """Counters describing how requests wait for database connections."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.timeouts = 0
+            self.connect_errors = 0
+            self.overflow_connections = 0
+
+    def record_checkout(self, wait, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+
+    def record_connect_error(self):
+        with self._lock:
+            self.connect_errors += 1
+
+    def record_overflow(self):
+        with self._lock:
+            self.overflow_connections += 1
+
+    def stats(self, pool=None):
+        with self._lock:
+            stats = {
+                'checkouts': self.checkouts,
+                'checkout_wait_total': round(self.wait_total, 6),
+                'checkout_wait_avg': round(self.wait_total / self.checkouts, 6) if self.checkouts else 0.0,
+                'checkout_wait_max': round(self.wait_max, 6),
+                'timeouts': self.timeouts,
+                'connect_errors': self.connect_errors,
+                'overflow_connections': self.overflow_connections,
+            }
+        if isinstance(pool, QueuePool):
+            stats.update({
+                'pool_size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+            })
+        return stats
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool recording how long each checkout waited, in its own ``metrics``."""
+
+    def __init__(self, creator, metrics=None, **kwargs):
+        super(InstrumentedQueuePool, self).__init__(creator, **kwargs)
+        self.metrics = metrics if metrics is not None else PoolMetrics()
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool; the engine's history carries over
+        pool = super(InstrumentedQueuePool, self).recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _create_connection(self):
+        # the overflow counter is already bumped when an extra connection opens
+        if self.overflow() > 0:
+            self.metrics.record_overflow()
+        return super(InstrumentedQueuePool, self)._create_connection()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super(InstrumentedQueuePool, self)._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_checkout(time.perf_counter() - start, timed_out=True)
+            raise
+        except Exception:
+            # e.g. the database refused a new connection; not a wait for the pool
+            self.metrics.record_connect_error()
+            raise
+        self.metrics.record_checkout(time.perf_counter() - start)
+        return connection
+
+
+def pool_report(engines):
+    """The metrics and state of each engine's pool, keyed by its URL without the password."""
+    report = {}
+    for engine in engines:
+        pool = engine.pool
+        metrics = getattr(pool, 'metrics', None)
+        report[repr(engine.url)] = metrics.stats(pool) if metrics is not None else {'pool': type(pool).__name__}
+    return report
+
+
+# ----------------------------------------------------------------------------#
+# Statements.
+# ----------------------------------------------------------------------------#
+def truncate(value, limit=500):
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+class QueryMetrics(object):
+    """Statement counts and timings of each request, from engine events.
+
+    Every engine (primary and replicas) is covered. For each request the
+    number of statements, the total database time and the SQL_TIMING_TOP
+    slowest statements are kept on ``g.sql_stats`` and summed up in a
+    ``Server-Timing`` header. Statements slower than SLOW_QUERY_SECONDS, and
+    requests whose statements took SLOW_REQUEST_DB_SECONDS in all (with their
+    slowest statements), go to the app's child of the ``fyyur.slow_queries``
+    logger as one JSON object per line. Each app with a SLOW_QUERY_LOG writes
+    to its own file; apps without one pass the records up to the parent.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger('fyyur.slow_queries')
+        self._apps = itertools.count(1)
+        self._handlers = {}
+        self._lock = threading.Lock()
+        event.listen(Engine, 'before_cursor_execute', self._before_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_execute)
+        event.listen(Engine, 'handle_error', self._failed_execute)
+
+    def init_app(self, app):
+        app.before_request(self._start_request)
+        app.after_request(self._add_server_timing)
+        logger = self.logger.getChild('app%d' % next(self._apps))
+        path = app.config.get('SLOW_QUERY_LOG')
+        if path:
+            logger.addHandler(self._file_handler(os.path.abspath(path)))
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+        app.extensions['query_metrics'] = logger
+
+    def _file_handler(self, path):
+        """A handler writing to ``path``; apps logging to the same file share it."""
+        with self._lock:
+            if path not in self._handlers:
+                # a background thread does the file writes, so requests never wait on them
+                records = queue.Queue(-1)
+                listener = QueueListener(records, logging.FileHandler(path))
+                listener.start()
+                self._handlers[path] = QueueHandler(records)
+            return self._handlers[path]
+
+    @property
+    def app_logger(self):
+        return current_app.extensions.get('query_metrics') or self.logger
+
+    def _start_request(self):
+        g.sql_stats = {'count': 0, 'total': 0.0, 'slowest': [], 'started': time.perf_counter()}
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _failed_execute(self, context):
+        starts = context.connection.info.get('query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info['query_start'].pop()
+        if not has_app_context():
+            return
+        config = current_app.config
+        stats = g.get('sql_stats') if has_request_context() else None
+        if stats is not None:
+            stats['count'] += 1
+            stats['total'] += duration
+            slowest = stats['slowest']
+            top = config.get('SQL_TIMING_TOP', 5)
+            if len(slowest) < top or duration > slowest[-1][0]:
+                slowest.append((duration, statement, parameters))
+                slowest.sort(key=lambda s: s[0], reverse=True)
+                del slowest[top:]
+        if duration >= config.get('SLOW_QUERY_SECONDS', 0.25):
+            self.app_logger.warning(json.dumps({
+                'kind': 'statement',
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'duration_ms': round(duration * 1000, 3),
+                'method': request.method if has_request_context() else None,
+                'path': request.full_path if has_request_context() else None,
+                'database': conn.engine.url.database,
+                'statement': ' '.join(statement.split()),
+                'parameters': truncate(parameters),
+            }))
+
+    def _add_server_timing(self, response):
+        stats = g.get('sql_stats')
+        if stats is None:
+            return response
+        if stats['total'] >= current_app.config.get('SLOW_REQUEST_DB_SECONDS', 0.5):
+            self._log_request(stats)
+        if not current_app.config.get('SERVER_TIMING', True):
+            return response
+        total = (time.perf_counter() - stats['started']) * 1000
+        response.headers.add('Server-Timing',
+                             'db;desc="%d queries";dur=%.2f' % (stats['count'], stats['total'] * 1000))
+        response.headers.add('Server-Timing', 'app;dur=%.2f' % total)
+        return response
+
+    def _log_request(self, stats):
+        """Log a request's total database time with its slowest statements."""
+        self.app_logger.warning(json.dumps({
+            'kind': 'request',
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'method': request.method,
+            'path': request.full_path,
+            'statements': stats['count'],
+            'db_ms': round(stats['total'] * 1000, 3),
+            'slowest': [{'duration_ms': round(duration * 1000, 3), 'statement': ' '.join(statement.split()),
+                         'parameters': truncate(parameters)} for duration, statement, parameters in stats['slowest']],
+        }))
+
+
+query_metrics = QueryMetrics()
+
+
+def engine_options(config, uri=None):
+    """SQLAlchemy engine options for the pool settings in ``config``.
+
+    ``uri`` defaults to the primary database. SQLite keeps SQLAlchemy's
+    default pool, which takes none of these options.
+    """
+    if (uri or config['SQLALCHEMY_DATABASE_URI']).startswith('sqlite'):
+        return {}
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
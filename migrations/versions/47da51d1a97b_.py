@@ -0,0 +1,35 @@
+"""trigram indexes for name search
+
+Revision ID: 47da51d1a97b
+Revises: 11aae5c3088e
+Create Date: 2026-10-18 10:12:41.204117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '47da51d1a97b'
+down_revision = '11aae5c3088e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pg_trgm lets the ILIKE '%term%' searches use a GIN index instead of a
+    # sequential scan. Other dialects keep the plain scan.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_venues_name_trgm', 'venues', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_artists_name_trgm', 'artists', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_artists_name_trgm', table_name='artists')
+    op.drop_index('ix_venues_name_trgm', table_name='venues')
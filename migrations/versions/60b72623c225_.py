@@ -0,0 +1,34 @@
+"""composite show indexes for the detail pages and the shows listing
+
+Revision ID: 60b72623c225
+Revises: 47da51d1a97b
+Create Date: 2026-10-18 10:41:03.518220
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '60b72623c225'
+down_revision = '47da51d1a97b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # built without locking the shows table against writes; CONCURRENTLY cannot run in a transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time'], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time'], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_shows_start_time_artist_id_venue_id', 'shows', ['start_time', 'artist_id', 'venue_id'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_shows_start_time_artist_id_venue_id', table_name='shows', postgresql_concurrently=True)
+        op.drop_index('ix_shows_artist_id_start_time', table_name='shows', postgresql_concurrently=True)
+        op.drop_index('ix_shows_venue_id_start_time', table_name='shows', postgresql_concurrently=True)
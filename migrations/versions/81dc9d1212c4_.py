@@ -0,0 +1,31 @@
+"""table_versions, the last deletion per table
+
+Revision ID: 81dc9d1212c4
+Revises: 81f1bddbb85b
+Create Date: 2026-10-18 20:02:17.514208
+
+Listing ETags were built from count(id) and max(updated_at), which reads the
+whole table on Postgres. Deletions are now recorded here instead, so the
+version is an indexed max() plus a primary key lookup.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '81dc9d1212c4'
+down_revision = '81f1bddbb85b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('table_versions',
+                    sa.Column('name', sa.String(length=64), nullable=False),
+                    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('name'))
+
+
+def downgrade():
+    op.drop_table('table_versions')
@@ -0,0 +1,30 @@
+"""venue directory index on (state, city, id)
+
+Revision ID: 81f1bddbb85b
+Revises: a9e561db23e4
+Create Date: 2026-10-18 19:12:40.226517
+
+The venue directory is ordered and keyset paginated on (state, city, id),
+so each page is a range scan of this index instead of a sort of the table.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '81f1bddbb85b'
+down_revision = 'a9e561db23e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venues_state_city_id', 'venues', ['state', 'city', 'id'], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_venues_state_city_id', table_name='venues', postgresql_concurrently=True)
@@ -0,0 +1,43 @@
+"""denormalized show counters on venues and artists
+
+Revision ID: a9e561db23e4
+Revises: d2c56ba9eea8
+Create Date: 2026-10-18 15:21:09.402716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9e561db23e4'
+down_revision = 'd2c56ba9eea8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('shows', sa.Column('counted_past', sa.Boolean(), nullable=False, server_default=sa.false()))
+    for table in ('venues', 'artists'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), nullable=False, server_default='0'))
+
+    op.execute('UPDATE shows SET counted_past = start_time <= localtimestamp WHERE start_time IS NOT NULL')
+    for table, owner in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        op.execute(
+            'UPDATE {table} SET '
+            'upcoming_shows_count = (SELECT count(*) FROM shows WHERE shows.{owner} = {table}.id '
+            'AND shows.start_time IS NOT NULL AND NOT shows.counted_past), '
+            'past_shows_count = (SELECT count(*) FROM shows WHERE shows.{owner} = {table}.id '
+            'AND shows.start_time IS NOT NULL AND shows.counted_past)'.format(table=table, owner=owner)
+        )
+    op.create_index('ix_shows_uncounted_start_time', 'shows', ['start_time'], unique=False,
+                    postgresql_where=sa.text('NOT counted_past'))
+
+
+def downgrade():
+    op.drop_index('ix_shows_uncounted_start_time', table_name='shows')
+    for table in ('artists', 'venues'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+    op.drop_column('shows', 'counted_past')
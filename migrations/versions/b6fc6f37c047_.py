@@ -0,0 +1,60 @@
+"""surrogate primary key for shows
+
+Revision ID: b6fc6f37c047
+Revises: 60b72623c225
+Create Date: 2026-10-18 11:26:55.870314
+
+Gives shows its own id so an artist can play the same venue more than once.
+The id is backfilled in batches of artists, each committed on its own, so
+the table is never locked for the whole backfill. Downgrading requires every
+(artist_id, venue_id) pair to be unique again.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6fc6f37c047'
+down_revision = '60b72623c225'
+branch_labels = None
+depends_on = None
+
+# number of artists whose shows are numbered per backfill transaction
+BATCH_SIZE = 1000
+
+
+def upgrade():
+    bind = op.get_bind()
+    op.add_column('shows', sa.Column('id', sa.Integer(), nullable=True))
+    op.execute('CREATE SEQUENCE shows_id_seq OWNED BY shows.id')
+    op.execute("ALTER TABLE shows ALTER COLUMN id SET DEFAULT nextval('shows_id_seq')")
+
+    with op.get_context().autocommit_block():
+        low, high = bind.execute(sa.text('SELECT min(artist_id), max(artist_id) FROM shows')).first()
+        if low is not None:
+            for start in range(low, high + 1, BATCH_SIZE):
+                bind.execute(sa.text("UPDATE shows SET id = nextval('shows_id_seq') "
+                                     "WHERE id IS NULL AND artist_id >= :start AND artist_id < :stop")
+                             .bindparams(start=start, stop=start + BATCH_SIZE))
+
+        # build the new key without blocking writes, then swap it in
+        op.execute('ALTER TABLE shows ADD CONSTRAINT shows_id_not_null CHECK (id IS NOT NULL) NOT VALID')
+        op.execute('ALTER TABLE shows VALIDATE CONSTRAINT shows_id_not_null')
+        op.execute('CREATE UNIQUE INDEX CONCURRENTLY shows_id_key ON shows (id)')
+        op.execute('CREATE INDEX CONCURRENTLY ix_shows_start_time_id ON shows (start_time, id)')
+
+    op.alter_column('shows', 'id', nullable=False)
+    op.drop_constraint('shows_id_not_null', 'shows', type_='check')
+    op.drop_constraint('shows_pkey', 'shows', type_='primary')
+    op.execute('ALTER TABLE shows ADD CONSTRAINT shows_pkey PRIMARY KEY USING INDEX shows_id_key')
+    op.drop_index('ix_shows_start_time_artist_id_venue_id', table_name='shows')
+
+
+def downgrade():
+    op.create_index('ix_shows_start_time_artist_id_venue_id', 'shows', ['start_time', 'artist_id', 'venue_id'],
+                    unique=False)
+    op.drop_constraint('shows_pkey', 'shows', type_='primary')
+    op.create_primary_key('shows_pkey', 'shows', ['artist_id', 'venue_id'])
+    op.drop_index('ix_shows_start_time_id', table_name='shows')
+    op.drop_column('shows', 'id')
@@ -0,0 +1,33 @@
+"""updated_at versions on venues and artists
+
+Revision ID: c99353502371
+Revises: b6fc6f37c047
+Create Date: 2026-10-18 12:04:17.311962
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c99353502371'
+down_revision = 'b6fc6f37c047'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    now = sa.text("(now() at time zone 'utc')")
+    op.add_column('venues', sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=now))
+    op.add_column('artists', sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=now))
+    op.alter_column('venues', 'updated_at', server_default=None)
+    op.alter_column('artists', 'updated_at', server_default=None)
+    op.create_index(op.f('ix_venues_updated_at'), 'venues', ['updated_at'], unique=False)
+    op.create_index(op.f('ix_artists_updated_at'), 'artists', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_artists_updated_at'), table_name='artists')
+    op.drop_index(op.f('ix_venues_updated_at'), table_name='venues')
+    op.drop_column('artists', 'updated_at')
+    op.drop_column('venues', 'updated_at')
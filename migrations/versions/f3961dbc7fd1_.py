@@ -0,0 +1,77 @@
+"""genre dictionary with integer keyed venue and artist associations
+
+Revision ID: f3961dbc7fd1
+Revises: c99353502371
+Create Date: 2026-10-18 13:15:49.602377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3961dbc7fd1'
+down_revision = 'c99353502371'
+branch_labels = None
+depends_on = None
+
+# genre choices of the venue and artist forms
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk', 'Hip-Hop', 'Heavy Metal',
+    'Instrumental', 'Jazz', 'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other',
+]
+
+OWNERS = [('venue', 'venues'), ('artist', 'artists')]
+
+
+def upgrade():
+    genres = op.create_table('genres',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=128), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.bulk_insert(genres, [{'name': name} for name in GENRES])
+    for owner, _ in OWNERS:
+        op.execute('INSERT INTO genres (name) SELECT DISTINCT genre_name FROM {0}_genres '
+                   'WHERE genre_name NOT IN (SELECT name FROM genres)'.format(owner))
+
+    for owner, owner_table in OWNERS:
+        old_table = '{0}_genres'.format(owner)
+        op.rename_table(old_table, old_table + '_old')
+        op.drop_constraint('{0}_pkey'.format(old_table), old_table + '_old', type_='primary')
+        op.drop_constraint('{0}_{1}_id_fkey'.format(old_table, owner), old_table + '_old', type_='foreignkey')
+        op.create_table(old_table,
+        sa.Column('{0}_id'.format(owner), sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['{0}_id'.format(owner)], ['{0}.id'.format(owner_table)], ),
+        sa.ForeignKeyConstraint(['genre_id'], ['genres.id'], ),
+        sa.PrimaryKeyConstraint('{0}_id'.format(owner), 'genre_id')
+        )
+        op.execute('INSERT INTO {0} ({1}_id, genre_id) '
+                   'SELECT DISTINCT o.{1}_id, g.id FROM {0}_old o JOIN genres g ON g.name = o.genre_name'
+                   .format(old_table, owner))
+        op.drop_table(old_table + '_old')
+        op.create_index('ix_{0}_genre_id_{1}_id'.format(old_table, owner), old_table,
+                        ['genre_id', '{0}_id'.format(owner)], unique=False)
+
+
+def downgrade():
+    for owner, owner_table in OWNERS:
+        new_table = '{0}_genres'.format(owner)
+        op.drop_index('ix_{0}_genre_id_{1}_id'.format(new_table, owner), table_name=new_table)
+        op.rename_table(new_table, new_table + '_new')
+        op.drop_constraint('{0}_pkey'.format(new_table), new_table + '_new', type_='primary')
+        op.drop_constraint('{0}_{1}_id_fkey'.format(new_table, owner), new_table + '_new', type_='foreignkey')
+        op.create_table(new_table,
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('genre_name', sa.String(length=128), nullable=False),
+        sa.Column('{0}_id'.format(owner), sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['{0}_id'.format(owner)], ['{0}.id'.format(owner_table)], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.execute('INSERT INTO {0} (genre_name, {1}_id) '
+                   'SELECT g.name, n.{1}_id FROM {0}_new n JOIN genres g ON g.id = n.genre_id'
+                   .format(new_table, owner))
+        op.drop_table(new_table + '_new')
+    op.drop_table('genres')
@@ -0,0 +1,114 @@
+from datetime import datetime
+
+from routing import RoutingSQLAlchemy
+
+db = RoutingSQLAlchemy()
+
+
+# ----------------------------------------------------------------------------#
+# Models.
+# ----------------------------------------------------------------------------#
+class Show(db.Model):
+    __tablename__ = 'shows'
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+        db.Index('ix_shows_uncounted_start_time', 'start_time',
+                 postgresql_where=db.text('NOT counted_past'), sqlite_where=db.text('NOT counted_past')),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=True)
+    # True once the show is counted in past_shows_count rather than upcoming_shows_count.
+    counted_past = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+
+
+class Genre(db.Model):
+    __tablename__ = 'genres'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(128), nullable=False, unique=True)
+
+
+class Venue_Genre(db.Model):
+    __tablename__ = 'venue_genres'
+    __table_args__ = (
+        db.Index('ix_venue_genres_genre_id_venue_id', 'genre_id', 'venue_id'),
+    )
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), primary_key=True)
+    genre_id = db.Column(db.Integer, db.ForeignKey('genres.id'), primary_key=True)
+
+
+class Artist_Genre(db.Model):
+    __tablename__ = 'artist_genres'
+    __table_args__ = (
+        db.Index('ix_artist_genres_genre_id_artist_id', 'genre_id', 'artist_id'),
+    )
+
+    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), primary_key=True)
+    genre_id = db.Column(db.Integer, db.ForeignKey('genres.id'), primary_key=True)
+
+
+class Venue(db.Model):
+    __tablename__ = 'venues'
+    __table_args__ = (
+        db.Index('ix_venues_state_city_id', 'state', 'city', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(256), nullable=False)
+    city = db.Column(db.String(256), nullable=False)
+    state = db.Column(db.String(12), nullable=False)
+    address = db.Column(db.String(512), nullable=False)
+    phone = db.Column(db.String(32), nullable=False)
+    seeking_talent = db.Column(db.Boolean, nullable=False)
+    seeking_description = db.Column(db.String(), nullable=True)
+    web_site = db.Column(db.String(512), nullable=True)
+    facebook_link = db.Column(db.String(), nullable=True)
+    image_link = db.Column(db.String(), nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    genre_links = db.relationship('Venue_Genre', lazy=True, cascade="all, delete-orphan")
+    genres = db.relationship('Genre', secondary='venue_genres', lazy=True, viewonly=True, order_by='Genre.name')
+    venue_shows = db.relationship('Show', backref='venue_shows', lazy=True, cascade="all, delete-orphan")
+
+
+class Artist(db.Model):
+    __tablename__ = 'artists'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(256), nullable=False)
+    state = db.Column(db.String(12), nullable=False)
+    city = db.Column(db.String(256), nullable=False)
+    address = db.Column(db.String(512), nullable=False)
+    phone = db.Column(db.String(32), nullable=False)
+    seeking_venue = db.Column(db.Boolean, nullable=False)
+    seeking_description = db.Column(db.String(), nullable=True)
+    web_site = db.Column(db.String(), nullable=True)
+    image_link = db.Column(db.String(), nullable=True)
+    facebook_link = db.Column(db.String(), nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    genre_links = db.relationship('Artist_Genre', lazy=True, cascade="all, delete-orphan")
+    genres = db.relationship('Genre', secondary='artist_genres', lazy=True, viewonly=True, order_by='Genre.name')
+    artist_shows = db.relationship('Show', backref='artist_shows', lazy=True, cascade="all, delete-orphan")
+
+
+class FacetCount(db.Model):
+    __tablename__ = 'facet_counts'
+    entity = db.Column(db.String(16), primary_key=True)
+    facet = db.Column(db.String(32), primary_key=True)
+    value = db.Column(db.String(256), primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
+
+
+class TableVersion(db.Model):
+    """When rows were last deleted from a table, which ``max(updated_at)`` cannot tell."""
+    __tablename__ = 'table_versions'
+    name = db.Column(db.String(64), primary_key=True)
+    deleted_at = db.Column(db.DateTime, nullable=False)
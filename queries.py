@@ -0,0 +1,463 @@
+import base64
+import json
+from collections import Counter
+from datetime import datetime
+
+from flask import abort, current_app, request, url_for
+from sqlalchemy import and_, case, func, tuple_
+from sqlalchemy.orm import joinedload, selectinload
+
+from cache import page_cache
+from models import db, Show, Genre, Venue_Genre, Artist_Genre, Venue, Artist, FacetCount, TableVersion
+
+
+def venue_directory():
+    """Query venues with their city, state and upcoming show count.
+
+    The count is the denormalized ``upcoming_shows_count``, so the directory
+    never touches the shows table.
+    """
+    return db.session.query(Venue.city, Venue.state, Venue.id, Venue.name,
+                            Venue.upcoming_shows_count.label('num_upcoming_shows'))
+
+
+def show_listing():
+    """Query shows that have a start time, with their venue and artist."""
+    return Show.query.join(Venue).join(Artist).with_entities(Venue.id.label('venue_id'),
+                                                             Venue.name.label('venue_name'), Artist.id,
+                                                             Artist.name, Artist.image_link,
+                                                             Show.start_time, Show.id.label('show_id')) \
+        .filter(Show.start_time.isnot(None))
+
+
+def group_by_area(rows):
+    """Group venue directory rows, ordered by state and city, in one pass."""
+    data = []
+    for r in rows:
+        if not data or data[-1]['city'] != r.city or data[-1]['state'] != r.state:
+            data.append({
+                "city": r.city,
+                "state": r.state,
+                "venues": []
+            })
+        data[-1]['venues'].append({
+            "id": r.id,
+            "name": r.name,
+            "num_upcoming_shows": r.num_upcoming_shows
+        })
+    return data
+
+
+def encode_cursor(values):
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, types):
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(types):
+            raise ValueError(cursor)
+        return [t(v) for t, v in zip(types, values)]
+    except (ValueError, TypeError):
+        abort(400)
+
+
+def keyset_page(query, columns, keys, types):
+    """Return one page of ``query`` using keyset pagination on ``columns``.
+
+    ``keys`` are the row attributes holding the values of ``columns`` and
+    ``types`` convert decoded cursor values back. The page is a dict with
+    the ``items``, the ``next``/``prev`` cursors (None at either end) and the
+    other query ``args`` the pager links must keep.
+    """
+    per_page = request.args.get('per_page', current_app.config['PAGE_SIZE'], type=int)
+    per_page = max(1, min(per_page, current_app.config['MAX_PAGE_SIZE']))
+    args = {k: v for k, v in request.args.items() if k not in ('after', 'before')}
+    after = decode_cursor(request.args.get('after'), types)
+    before = decode_cursor(request.args.get('before'), types)
+
+    def cursor(row):
+        return encode_cursor([getattr(row, k) for k in keys])
+
+    if before is not None:
+        rows = query.filter(tuple_(*columns) < tuple_(*before)) \
+            .order_by(*[c.desc() for c in columns]).limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        return {
+            'items': rows,
+            'args': args,
+            'prev': cursor(rows[0]) if has_prev else None,
+            'next': cursor(rows[-1]) if rows else None
+        }
+
+    if after is not None:
+        query = query.filter(tuple_(*columns) > tuple_(*after))
+    rows = query.order_by(*columns).limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    return {
+        'items': rows,
+        'args': args,
+        'prev': cursor(rows[0]) if after is not None and rows else None,
+        'next': cursor(rows[-1]) if has_next else None
+    }
+
+
+def split_shows(shows, date_now):
+    """Split already loaded shows into (past, upcoming), ordered by start time."""
+    past_shows = []
+    upcoming_shows = []
+    for show in sorted(shows, key=lambda s: s.start_time or date_now):
+        if show.start_time is None or show.start_time == date_now:
+            continue
+        if show.start_time > date_now:
+            upcoming_shows.append(show)
+        else:
+            past_shows.append(show)
+    return past_shows, upcoming_shows
+
+
+def load_venue_detail(venue_id, date_now):
+    """Load a venue with its genres, shows and their artists in two statements."""
+    venue = Venue.query.options(joinedload(Venue.genres),
+                                selectinload(Venue.venue_shows).joinedload(Show.artist_shows)) \
+        .filter(Venue.id == venue_id).first_or_404()
+    past_shows, upcoming_shows = split_shows(venue.venue_shows, date_now)
+    return venue, past_shows, upcoming_shows
+
+
+def load_artist_detail(artist_id, date_now):
+    """Load an artist with its genres, shows and their venues in two statements."""
+    artist = Artist.query.options(joinedload(Artist.genres),
+                                  selectinload(Artist.artist_shows).joinedload(Show.venue_shows)) \
+        .filter(Artist.id == artist_id).first_or_404()
+    past_shows, upcoming_shows = split_shows(artist.artist_shows, date_now)
+    return artist, past_shows, upcoming_shows
+
+
+def search_by_name(model, key_word, query=None):
+    """Return (id, name) rows whose name contains ``key_word``, best match first.
+
+    On Postgres the ILIKE is served by the pg_trgm GIN index and rows are
+    ranked by trigram similarity; elsewhere shorter names rank first. At most
+    SEARCH_LIMIT rows are returned. ``query`` narrows the rows searched, e.g.
+    to a set of facet filters.
+    """
+    pattern = '%' + key_word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    if db.engine.dialect.name == 'postgresql':
+        rank = func.similarity(model.name, key_word).desc()
+    else:
+        rank = func.length(model.name)
+    if query is None:
+        query = model.query
+    return query.with_entities(model.id, model.name) \
+        .filter(model.name.ilike(pattern, escape='\\')) \
+        .order_by(rank, model.name, model.id) \
+        .limit(current_app.config['SEARCH_LIMIT']) \
+        .all()
+
+
+VENUE_FACETS = ('genre', 'state', 'city', 'seeking_talent')
+ARTIST_FACETS = ('genre', 'state', 'city', 'seeking_venue')
+FACET_LABELS = {
+    'genre': 'Genre',
+    'state': 'State',
+    'city': 'City',
+    'seeking_talent': 'Seeking talent',
+    'seeking_venue': 'Seeking venues',
+}
+
+
+def facet_filters(facets):
+    return {f: request.values[f] for f in facets if request.values.get(f)}
+
+
+def filter_by_facets(query, model, owner_column, filters):
+    """Narrow a venue or artist query to the selected facet values.
+
+    ``owner_column`` is the venue_id/artist_id column of the genre
+    association, used to reach the genre dictionary.
+    """
+    for facet, value in filters.items():
+        if facet == 'genre':
+            link_model = owner_column.class_
+            query = query.join(link_model, owner_column == model.id) \
+                .join(Genre, Genre.id == link_model.genre_id) \
+                .filter(Genre.name == value)
+        elif facet.startswith('seeking_'):
+            query = query.filter(getattr(model, facet) == (value == 'true'))
+        else:
+            query = query.filter(getattr(model, facet) == value)
+    return query
+
+
+def facet_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def refresh_facet_counts():
+    """Rebuild the facet_counts summary in one transaction.
+
+    Listing and search pages read their facet counts from this table instead
+    of counting on every request; run ``flask refresh-facets`` periodically.
+    """
+    refreshed_at = datetime.utcnow()
+    rows = []
+    for entity, model, owner_column, facets in (('venue', Venue, Venue_Genre.venue_id, VENUE_FACETS),
+                                                ('artist', Artist, Artist_Genre.artist_id, ARTIST_FACETS)):
+        for facet in facets:
+            if facet == 'genre':
+                counts = db.session.query(Genre.name, func.count(owner_column)) \
+                    .join(owner_column.class_, owner_column.class_.genre_id == Genre.id) \
+                    .group_by(Genre.name)
+            else:
+                column = getattr(model, facet)
+                counts = db.session.query(column, func.count(model.id)).group_by(column)
+            rows += [{'entity': entity, 'facet': facet, 'value': facet_value(value), 'count': count,
+                      'refreshed_at': refreshed_at} for value, count in counts]
+    FacetCount.query.delete()
+    if rows:
+        db.session.execute(FacetCount.__table__.insert(), rows)
+    db.session.commit()
+    page_cache.invalidate('facets')
+    return len(rows)
+
+
+def facet_sidebar(entity, facets, filters):
+    """Facet values with their counts and toggle links for the current page.
+
+    Every facet of ``entity`` comes from one query; each keeps its FACET_LIMIT
+    most common values. The counts are the precomputed ones for the whole
+    catalog, so they do not narrow with the active filters.
+    """
+    args = {k: v for k, v in request.values.items() if k not in ('after', 'before')}
+    limit = current_app.config['FACET_LIMIT']
+    counts = {facet: [] for facet in facets}
+    for c in FacetCount.query.filter(FacetCount.entity == entity) \
+            .order_by(FacetCount.count.desc(), FacetCount.value):
+        if c.facet in counts and len(counts[c.facet]) < limit:
+            counts[c.facet].append(c)
+    sidebar = []
+    for facet in facets:
+        options = []
+        for c in counts[facet]:
+            active = filters.get(facet) == c.value
+            link_args = dict(args)
+            if active:
+                link_args.pop(facet)
+            else:
+                link_args[facet] = c.value
+            options.append({
+                'value': c.value,
+                'label': {'true': 'Yes', 'false': 'No'}.get(c.value, c.value) if facet.startswith('seeking_')
+                else c.value,
+                'count': c.count,
+                'active': active,
+                'url': url_for(request.endpoint, **link_args)
+            })
+        if options:
+            sidebar.append({'facet': facet, 'label': FACET_LABELS[facet], 'options': options})
+    return sidebar
+
+
+def facets_version():
+    return db.session.query(func.max(FacetCount.refreshed_at)).scalar()
+
+
+def genre_ids(names):
+    """Map genre names to dictionary ids, adding names the dictionary lacks."""
+    ids = {g.name: g.id for g in Genre.query.filter(Genre.name.in_(names))}
+    missing = [n for n in names if n not in ids]
+    if missing:
+        db.session.execute(Genre.__table__.insert().values([{'name': n} for n in missing]))
+        ids.update((g.name, g.id) for g in Genre.query.filter(Genre.name.in_(missing)))
+    return [ids[n] for n in names]
+
+
+def set_genres(link_model, owner_column, owner_id, genres, is_new=False):
+    """Make ``genres`` the genre set of a venue or artist.
+
+    Only the genres that changed are written: one DELETE for the removed ones
+    and one multi-row INSERT for the added ones. Nothing is committed, so the
+    caller's transaction covers the whole form submission.
+    """
+    wanted = genre_ids(list(dict.fromkeys(genres))) if genres else []
+    if is_new:
+        current = set()
+    else:
+        current = {r.genre_id for r in db.session.query(link_model.genre_id).filter(owner_column == owner_id)}
+    removed = current.difference(wanted)
+    added = [g for g in wanted if g not in current]
+    if removed:
+        db.session.query(link_model) \
+            .filter(owner_column == owner_id, link_model.genre_id.in_(removed)) \
+            .delete(synchronize_session=False)
+    if added:
+        db.session.execute(link_model.__table__.insert().values(
+            [{owner_column.key: owner_id, 'genre_id': g} for g in added]))
+
+
+def venue_artist_ids(venue_id):
+    return [r.artist_id for r in db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()]
+
+
+def artist_venue_ids(artist_id):
+    return [r.venue_id for r in db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()]
+
+
+def venue_page_tags(venue_id, artist_ids):
+    """Cache tags of every page showing this venue, including its artists' pages."""
+    return ['venues', 'shows', 'venue:%s' % venue_id] + ['artist:%s' % a for a in artist_ids]
+
+
+def artist_page_tags(artist_id, venue_ids):
+    """Cache tags of every page showing this artist, including its venues' pages."""
+    return ['artists', 'shows', 'artist:%s' % artist_id] + ['venue:%s' % v for v in venue_ids]
+
+
+def touch(model, ids):
+    """Bump ``updated_at`` of the given venues or artists in the current transaction."""
+    if ids:
+        model.query.filter(model.id.in_(ids)).update({model.updated_at: datetime.utcnow()},
+                                                     synchronize_session=False)
+
+
+def count_shows(criterion, delta):
+    """Add ``delta`` for each show matching ``criterion`` to its venue and artist counters.
+
+    Shows count as past or upcoming according to their ``counted_past`` flag.
+    Call it with 1 after adding shows and with -1 before deleting them, in
+    the same transaction.
+    """
+    for model, owner_column in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        rows = db.session.query(owner_column, Show.counted_past, func.count(Show.id)) \
+            .filter(criterion, Show.start_time.isnot(None)) \
+            .group_by(owner_column, Show.counted_past)
+        for owner_id, counted_past, count in rows:
+            counter = model.past_shows_count if counted_past else model.upcoming_shows_count
+            model.query.filter(model.id == owner_id).update({counter: counter + delta * count},
+                                                            synchronize_session=False)
+
+
+def add_show_counts(rows):
+    """Add newly inserted shows, given as dicts, to their venue and artist counters.
+
+    Each counter is bumped with a single UPDATE ... CASE, however many venues
+    or artists the shows belong to.
+    """
+    for model, key in ((Venue, 'venue_id'), (Artist, 'artist_id')):
+        for past, counter in ((False, model.upcoming_shows_count), (True, model.past_shows_count)):
+            deltas = Counter(row[key] for row in rows if row['counted_past'] == past)
+            if deltas:
+                model.query.filter(model.id.in_(deltas)) \
+                    .update({counter: counter + case(dict(deltas), value=model.id)}, synchronize_session=False)
+
+
+def recount_shows():
+    """Recompute every venue and artist show counter from the shows table."""
+    for model, owner_column in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        def counter(past):
+            return db.session.query(func.count(Show.id)) \
+                .filter(owner_column == model.id, Show.start_time.isnot(None), Show.counted_past == past) \
+                .correlate(model).as_scalar()
+
+        model.query.update({model.upcoming_shows_count: counter(False), model.past_shows_count: counter(True)},
+                           synchronize_session=False)
+
+
+def roll_show_counters(date_now):
+    """Move shows that have started from the upcoming to the past counters.
+
+    Returns the number of shows moved. Only shows not yet counted as past are
+    read, through the partial index ix_shows_uncounted_start_time.
+    """
+    rows = db.session.query(Show.id, Show.venue_id, Show.artist_id) \
+        .filter(Show.counted_past.is_(False), Show.start_time <= date_now).all()
+    if not rows:
+        return 0
+    started = Show.id.in_([r.id for r in rows])
+    count_shows(started, -1)
+    Show.query.filter(started).update({Show.counted_past: True}, synchronize_session=False)
+    count_shows(started, 1)
+    venue_ids = {r.venue_id for r in rows}
+    artist_ids = {r.artist_id for r in rows}
+    touch(Venue, venue_ids)
+    touch(Artist, artist_ids)
+    db.session.commit()
+    page_cache.invalidate('venues', 'artists', *(['venue:%d' % v for v in venue_ids] +
+                                                 ['artist:%d' % a for a in artist_ids]))
+    return len(rows)
+
+
+def venue_version(venue_id):
+    """ETag parts and Last-Modified of a venue page, from one indexed lookup.
+
+    The next upcoming show is part of the version because the page changes
+    when that show moves from upcoming to past.
+    """
+    row = db.session.query(Venue.updated_at, func.min(Show.start_time)) \
+        .outerjoin(Show, and_(Show.venue_id == Venue.id, Show.start_time > datetime.now())) \
+        .filter(Venue.id == venue_id) \
+        .group_by(Venue.id, Venue.updated_at) \
+        .first()
+    if row is None:
+        return None
+    return ('venue', venue_id) + tuple(row), row[0]
+
+
+def artist_version(artist_id):
+    """ETag parts and Last-Modified of an artist page, see venue_version()."""
+    row = db.session.query(Artist.updated_at, func.min(Show.start_time)) \
+        .outerjoin(Show, and_(Show.artist_id == Artist.id, Show.start_time > datetime.now())) \
+        .filter(Artist.id == artist_id) \
+        .group_by(Artist.id, Artist.updated_at) \
+        .first()
+    if row is None:
+        return None
+    return ('artist', artist_id) + tuple(row), row[0]
+
+
+def record_deletion(model):
+    """Move the version of ``model``'s table after deleting rows from it."""
+    now = datetime.utcnow()
+    if not TableVersion.query.filter(TableVersion.name == model.__tablename__) \
+            .update({TableVersion.deleted_at: now}, synchronize_session=False):
+        db.session.add(TableVersion(name=model.__tablename__, deleted_at=now))
+
+
+def table_version(model):
+    """The last update and the last deletion of ``model``'s table, in one statement.
+
+    Each part is a lone ``max()`` or a primary key lookup, answered from an
+    index; a count would read the whole table on every request.
+    """
+    last_update = db.session.query(func.max(model.updated_at)).as_scalar()
+    last_deletion = db.session.query(TableVersion.deleted_at) \
+        .filter(TableVersion.name == model.__tablename__).as_scalar()
+    return tuple(db.session.query(last_update, last_deletion).first())
+
+
+def last_modified(*versions):
+    return max(filter(None, [part for version in versions for part in version]), default=None)
+
+
+def venues_version():
+    version = table_version(Venue)
+    return ('venues', facets_version()) + version, last_modified(version)
+
+
+def artists_version():
+    version = table_version(Artist)
+    return ('artists', facets_version()) + version, last_modified(version)
+
+
+def shows_version():
+    venues, artists = table_version(Venue), table_version(Artist)
+    last_show = db.session.query(func.max(Show.id)).scalar()
+    return ('shows', last_show) + venues + artists, last_modified(venues, artists)
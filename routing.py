@@ -0,0 +1,95 @@
+import itertools
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import create_engine, orm
+
+from metrics import engine_options
+
+
+# ----------------------------------------------------------------------------#
+# Replicas.
+# ----------------------------------------------------------------------------#
+class ReplicaSet(object):
+    """Engines for the read replicas and the strategy choosing between them."""
+
+    def __init__(self, engines, strategy='round_robin'):
+        if strategy not in ('round_robin', 'least_loaded'):
+            raise ValueError('Unknown REPLICA_STRATEGY: %s' % strategy)
+        self.engines = engines
+        self.strategy = strategy
+        self._turn = itertools.count()
+
+    def pick(self):
+        if self.strategy == 'least_loaded':
+            return min(self.engines, key=_checked_out)
+        return self.engines[next(self._turn) % len(self.engines)]
+
+    def dispose(self):
+        for engine in self.engines:
+            engine.dispose()
+
+
+def _checked_out(engine):
+    pool = engine.pool
+    return pool.checkedout() if hasattr(pool, 'checkedout') else 0
+
+
+def init_replicas(app):
+    """Create the replica engines listed in ``SQLALCHEMY_REPLICA_URIS``."""
+    uris = app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+    if not uris:
+        app.extensions.pop('replicas', None)
+        return
+    if not app.config.get('SECRET_KEY'):
+        # the read-your-writes pin lives in the signed session, which every worker must be able to read
+        raise RuntimeError('SECRET_KEY must be set when SQLALCHEMY_REPLICA_URIS is')
+    engines = [create_engine(uri, **engine_options(app.config, uri)) for uri in uris]
+    app.extensions['replicas'] = ReplicaSet(engines, app.config.get('REPLICA_STRATEGY', 'round_robin'))
+
+
+# ----------------------------------------------------------------------------#
+# Session.
+# ----------------------------------------------------------------------------#
+def read_only(view):
+    """Serve the view from a replica, unless this browser has just written.
+
+    Must sit directly under the route decorator so the ETag and page cache
+    lookups are routed too.
+    """
+
+    @wraps(view)
+    def wrapper(**kwargs):
+        g.use_replica = session.get('_primary_until', 0) < time.time()
+        return view(**kwargs)
+
+    return wrapper
+
+
+class RoutingSession(SignallingSession):
+    """Session sending the statements of ``read_only`` views to a replica.
+
+    Everything else, including any flush, goes to the primary. A commit made
+    during a request pins the browser to the primary for
+    ``READ_YOUR_WRITES_SECONDS`` so it never reads behind its own write.
+    """
+
+    def get_bind(self, mapper=None, clause=None):
+        replicas = self.app.extensions.get('replicas')
+        if replicas and not self._flushing and has_request_context() and g.get('use_replica'):
+            if 'replica' not in g:
+                g.replica = replicas.pick()  # one replica per request, so its reads are consistent
+            return g.replica
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+    def commit(self):
+        super(RoutingSession, self).commit()
+        if has_request_context() and current_app.extensions.get('replicas'):
+            session['_primary_until'] = time.time() + current_app.config.get('READ_YOUR_WRITES_SECONDS', 10)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
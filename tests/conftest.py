@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import pytest
+
+from app import create_app
+from models import db as _db, Artist, Show, Venue
+from queries import add_show_counts
+
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'test',
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'SQLALCHEMY_REPLICA_URIS': [],
+        'WTF_CSRF_ENABLED': False,
+        'CACHE_TYPE': 'null',
+        'SLOW_QUERY_LOG': None,
+    })
+    with app.app_context():
+        _db.create_all()
+        yield app
+        _db.session.remove()
+        _db.drop_all()
+
+
+@pytest.fixture
+def db(app):
+    return _db
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_venue(db):
+    def make_venue(name='Venue', city='San Francisco', state='CA', **fields):
+        venue = Venue(name=name, city=city, state=state, address='1 Main St', phone='555-0000',
+                      seeking_talent=False, **fields)
+        db.session.add(venue)
+        db.session.commit()
+        return venue
+
+    return make_venue
+
+
+@pytest.fixture
+def make_artist(db):
+    def make_artist(name='Artist', city='San Francisco', state='CA', **fields):
+        artist = Artist(name=name, city=city, state=state, address='1 Main St', phone='555-0000',
+                        seeking_venue=False, **fields)
+        db.session.add(artist)
+        db.session.commit()
+        return artist
+
+    return make_artist
+
+
+@pytest.fixture
+def make_show(db):
+    """Add a show and count it, as the create handlers do."""
+    def make_show(venue, artist, start_time):
+        row = {'venue_id': venue.id, 'artist_id': artist.id, 'start_time': start_time,
+               'counted_past': start_time <= datetime.now()}
+        show = Show(**row)
+        db.session.add(show)
+        db.session.flush()
+        add_show_counts([row])
+        db.session.commit()
+        return show
+
+    return make_show
@@ -0,0 +1,62 @@
+import os
+import time
+
+from app import create_app
+from cache import LRUBackend, NullBackend, page_cache
+from models import db
+
+
+def make_app(**config):
+    app = create_app(dict({
+        'TESTING': True,
+        'SECRET_KEY': 'test',
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'SQLALCHEMY_REPLICA_URIS': [],
+        'SLOW_QUERY_LOG': None,
+    }, **config))
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def wait_for(path, timeout=2):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if os.path.exists(path) and os.path.getsize(path):
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_apps_keep_their_own_cache():
+    first = make_app(CACHE_TYPE='lru')
+    second = make_app(CACHE_TYPE='null')
+
+    with first.app_context():
+        assert isinstance(page_cache.state.backend, LRUBackend)
+    with second.app_context():
+        assert isinstance(page_cache.state.backend, NullBackend)
+
+
+def test_apps_keep_their_own_compression_settings():
+    first = make_app(COMPRESS=True, COMPRESS_MIN_SIZE=0)
+    make_app(COMPRESS=False)
+
+    response = first.test_client().get('/', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers.get('Content-Encoding') == 'gzip'
+
+
+def test_apps_write_their_own_slow_query_log(tmp_path):
+    first_log, second_log = str(tmp_path / 'first.log'), str(tmp_path / 'second.log')
+    make_app(SLOW_QUERY_LOG=first_log, SLOW_QUERY_SECONDS=0)
+    second = make_app(SLOW_QUERY_LOG=second_log, SLOW_QUERY_SECONDS=0)
+    assert wait_for(first_log) and wait_for(second_log)  # create_all's statements
+
+    second.test_client().get('/venues')
+
+    time.sleep(0.1)
+    with open(first_log) as f:
+        assert '/venues' not in f.read()
+    with open(second_log) as f:
+        assert '"path": "/venues?"' in f.read()
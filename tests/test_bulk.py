@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+from bulk import ENTITIES, import_records
+from models import Artist, Show, Venue
+
+
+def import_shows(records):
+    errors = []
+    imported, rejected, _ = import_records(ENTITIES['shows'], enumerate(records, 2),
+                                           on_error=lambda line_no, message: errors.append((line_no, message)))
+    return imported, rejected, errors
+
+
+def when(days):
+    return (datetime.now() + timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def test_import_rejects_invalid_records(make_venue, make_artist):
+    make_venue(), make_artist()
+
+    imported, rejected, errors = import_shows([
+        {'id': '10', 'venue_id': '1', 'artist_id': '1', 'start_time': when(1)},
+        {'id': 'ten', 'venue_id': '1', 'artist_id': '1', 'start_time': when(2)},
+        {'id': '11', 'venue_id': '1', 'artist_id': '1', 'start_time': ''},
+        {'id': '10', 'venue_id': '1', 'artist_id': '1', 'start_time': when(3)},
+        {'id': '12', 'venue_id': '99', 'artist_id': '1', 'start_time': when(4)},
+        {'id': '13', 'venue_id': '1', 'artist_id': '99', 'start_time': when(5)},
+    ])
+
+    assert (imported, rejected) == (1, 5)
+    assert errors == [
+        (3, 'id: Not a valid integer.'),
+        (4, 'start_time: This field is required.'),
+        (5, 'id: 10 appears more than once in the file.'),
+        (None, '2 shows reference a venue or artist that does not exist'),
+    ]
+    assert [show.id for show in Show.query.all()] == [10]
+
+
+def test_import_recounts_shows(db, make_venue, make_artist, make_show):
+    venue, artist = make_venue(), make_artist()
+    make_show(venue, artist, datetime.now() + timedelta(days=1))
+
+    imported, rejected, errors = import_shows([
+        {'venue_id': '1', 'artist_id': '1', 'start_time': when(-2)},
+        {'venue_id': '1', 'artist_id': '1', 'start_time': when(-1)},
+        {'venue_id': '1', 'artist_id': '1', 'start_time': when(2)},
+    ])
+
+    assert (imported, rejected, errors) == (3, 0, [])
+    db.session.expire_all()
+    venue, artist = Venue.query.get(1), Artist.query.get(1)
+    assert (venue.upcoming_shows_count, venue.past_shows_count) == (2, 2)
+    assert (artist.upcoming_shows_count, artist.past_shows_count) == (2, 2)
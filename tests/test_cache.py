@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from cache import page_cache
+
+VENUE_FORM = {'name': 'New Venue', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St',
+              'phone': '555-0000', 'facebook_link': '', 'seeking_talent': 'false', 'seeking_description': '',
+              'image_link': '', 'website_link': '', 'genres': ['Jazz']}
+ARTIST_FORM = {'name': 'New Artist', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St',
+               'phone': '555-0000', 'facebook_link': '', 'seeking_venue': 'false', 'seeking_description': '',
+               'image_link': '', 'website_link': '', 'genres': ['Jazz']}
+
+# each write handler, and the tags whose pages it must invalidate
+WRITES = [
+    ('create venue', lambda client: client.post('/venues/create', data=VENUE_FORM), ['venues']),
+    ('create artist', lambda client: client.post('/artists/create', data=ARTIST_FORM), ['artists']),
+    ('create show', lambda client: client.post('/shows/create', data={
+        'venue_id': 1, 'artist_id': 1, 'start_time': '2100-01-01 20:00:00'}),
+     ['shows', 'venues', 'venue:1', 'artist:1']),
+    ('create shows', lambda client: client.post('/shows/batch', data={'shows': '1, 1, 2100-01-01 20:00:00'}),
+     ['shows', 'venues', 'venue:1', 'artist:1']),
+    ('edit venue', lambda client: client.post('/venues/1/edit', data=VENUE_FORM),
+     ['venues', 'shows', 'venue:1', 'artist:1']),
+    ('edit artist', lambda client: client.post('/artists/1/edit', data=ARTIST_FORM),
+     ['artists', 'shows', 'artist:1', 'venue:1']),
+    ('delete venue', lambda client: client.delete('/venues/1'), ['venues', 'shows', 'venue:1', 'artist:1']),
+    ('delete artist', lambda client: client.delete('/artist/1'), ['artists', 'shows', 'artist:1', 'venue:1']),
+]
+
+
+@pytest.fixture
+def cache(app):
+    app.config['CACHE_TYPE'] = 'lru'
+    page_cache.init_app(app)
+    return page_cache.state
+
+
+@pytest.fixture
+def booked(make_venue, make_artist, make_show):
+    """Venue 1 and artist 1, with a show together."""
+    venue, artist = make_venue(), make_artist()
+    make_show(venue, artist, datetime.now() + timedelta(days=1))
+    return venue, artist
+
+
+def test_second_request_is_a_hit(client, cache, booked):
+    first = client.get('/venues/1')
+    second = client.get('/venues/1')
+
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert second.get_data() == first.get_data()
+
+
+@pytest.mark.parametrize('name, write, tags', WRITES, ids=[w[0] for w in WRITES])
+def test_write_handlers_invalidate_their_pages(client, cache, booked, name, write, tags):
+    before = cache.backend.get_versions(tags)
+
+    write(client)
+
+    after = cache.backend.get_versions(tags)
+    assert [tag for tag, old, new in zip(tags, before, after) if new <= old] == []
+
+
+def test_pages_with_pending_flashes_are_not_cached(client, cache, booked):
+    with client.session_transaction() as session:
+        session['_flashes'] = [('message', 'Venue was successfully listed!')]
+
+    flashed = client.get('/venues').get_data(as_text=True)
+    assert 'successfully listed' in flashed
+    assert (cache.misses, cache.hits) == (0, 0)
+
+    client.get('/venues')
+    page = client.get('/venues').get_data(as_text=True)
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert 'successfully listed' not in page
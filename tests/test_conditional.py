@@ -0,0 +1,71 @@
+import gzip
+
+import pytest
+
+from cache import page_cache
+
+
+@pytest.fixture
+def cache(app):
+    app.config['CACHE_TYPE'] = 'lru'
+    page_cache.init_app(app)
+    return page_cache.state
+
+
+@pytest.mark.parametrize('url', ['/venues', '/venues/1', '/artists', '/artists/1', '/shows'])
+def test_matching_etag_answers_304(client, make_venue, make_artist, url):
+    make_venue(), make_artist()
+    first = client.get(url)
+    assert first.headers['ETag']
+    assert first.headers['Last-Modified']
+
+    response = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.headers['ETag'] == first.headers['ETag']
+
+
+def test_gzip_response_revalidates(client, cache, make_venue):
+    make_venue('Gzipped Venue')
+    headers = {'Accept-Encoding': 'gzip'}
+    first = client.get('/venues/1', headers=headers)
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert first.headers['ETag'].startswith('W/')  # the encoded bytes differ from the plain ones
+    assert b'Gzipped Venue' in gzip.decompress(first.get_data())
+
+    response = client.get('/venues/1', headers=dict(headers, **{'If-None-Match': first.headers['ETag']}))
+    assert response.status_code == 304
+    assert response.headers['ETag'] == first.headers['ETag']
+
+    cached = client.get('/venues/1', headers=headers)
+    assert cache.hits == 1
+    assert cached.headers['ETag'] == first.headers['ETag']
+    assert cached.get_data() == first.get_data()
+
+
+def test_edit_moves_the_etag(client, make_venue):
+    make_venue()
+    etag = client.get('/venues/1').headers['ETag']
+
+    client.post('/venues/1/edit', data={'name': 'Renamed', 'city': 'San Francisco', 'state': 'CA',
+                                        'address': '1 Main St', 'phone': '555-0000', 'facebook_link': '',
+                                        'seeking_talent': 'false', 'seeking_description': '', 'image_link': '',
+                                        'website_link': '', 'genres': ['Jazz']})
+
+    response = client.get('/venues/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'Renamed' in response.get_data(as_text=True)
+
+
+def test_pages_with_pending_flashes_get_no_validators(client, make_venue):
+    make_venue()
+    etag = client.get('/venues/1').headers['ETag']
+    with client.session_transaction() as session:
+        session['_flashes'] = [('message', 'Venue was successfully listed!')]
+
+    response = client.get('/venues/1', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+    assert 'successfully listed' in response.get_data(as_text=True)
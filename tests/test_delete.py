@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from models import Artist, Show, Venue
+
+
+def test_delete_artist_removes_the_artist_and_its_show_counts(client, db, make_venue, make_artist, make_show):
+    venue = make_venue()
+    artist = make_artist()
+    other = make_artist('Other Artist')
+    make_show(venue, artist, datetime.now() - timedelta(days=3))
+    make_show(venue, artist, datetime.now() + timedelta(days=3))
+    make_show(venue, other, datetime.now() + timedelta(days=4))
+    venue_id, artist_id = venue.id, artist.id
+
+    response = client.delete('/artist/%d' % artist_id)
+
+    assert response.status_code == 302
+    db.session.expire_all()
+    assert Artist.query.get(artist_id) is None
+    assert Show.query.filter(Show.artist_id == artist_id).count() == 0
+    venue = Venue.query.get(venue_id)
+    assert (venue.upcoming_shows_count, venue.past_shows_count) == (1, 0)
+
+
+def test_delete_venue_removes_the_venue_and_its_show_counts(client, db, make_venue, make_artist, make_show):
+    venue = make_venue()
+    other = make_venue('Other Venue')
+    artist = make_artist()
+    make_show(venue, artist, datetime.now() - timedelta(days=3))
+    make_show(other, artist, datetime.now() + timedelta(days=3))
+    venue_id, artist_id = venue.id, artist.id
+
+    response = client.delete('/venues/%d' % venue_id)
+
+    assert response.status_code == 302
+    db.session.expire_all()
+    assert Venue.query.get(venue_id) is None
+    artist = Artist.query.get(artist_id)
+    assert (artist.upcoming_shows_count, artist.past_shows_count) == (1, 0)
+
+
+def test_deleting_a_venue_moves_the_directory_etag(client, make_venue):
+    make_venue('Kept')
+    deleted = make_venue('Deleted')
+    etag = client.get('/venues').headers['ETag']
+    assert client.get('/venues', headers={'If-None-Match': etag}).status_code == 304
+
+    client.delete('/venues/%d' % deleted.id)
+    client.get('/venues')  # shows the flashed message, which is never revalidated
+
+    response = client.get('/venues', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'Deleted' not in response.get_data(as_text=True)
@@ -0,0 +1,42 @@
+import re
+
+from catalog import generate_catalog
+
+# Scans SQLite cannot avoid, so `flask explain` reports them on every SQLite
+# database; PostgreSQL serves them from indexes SQLite does not have.
+SQLITE_SCANS = {
+    # lower(name) LIKE '%term%' needs a trigram index
+    ('venue search', 'venues'),
+    ('artist search', 'artists'),
+    # the genre join on the detail pages walks the (genre_id, owner_id) index
+    ('venue detail', 'venue_genres'),
+    ('artist detail', 'artist_genres'),
+}
+
+
+def explain(app, min_rows):
+    """Run `flask explain` and return its plans and reported scans, by page."""
+    result = app.test_cli_runner().invoke(args=['explain', '--min-rows', str(min_rows)])
+    plans, scans, page = {}, set(), None
+    for line in result.output.splitlines():
+        if line.startswith('== '):
+            page = line[3:]
+            plans[page] = ''
+            continue
+        plans[page] += line + '\n'
+        match = re.search(r'\(sequential scan on (.+)!\)$', line)
+        if match:
+            scans.update((page, table) for table in match.group(1).split(', '))
+    return result, plans, scans
+
+
+def test_hot_pages_use_the_show_indexes(app):
+    generate_catalog(200, 200, 2000, seed=0)
+
+    result, plans, scans = explain(app, min_rows=100)
+
+    assert 'ix_shows_start_time_id' in plans['shows listing']
+    assert 'ix_shows_venue_id_start_time' in plans['venue detail']
+    assert 'ix_shows_artist_id_start_time' in plans['artist detail']
+    assert scans <= SQLITE_SCANS
+    assert result.exit_code == (1 if scans else 0)
@@ -0,0 +1,41 @@
+import json
+import logging
+
+
+def records(caplog, kind):
+    return [json.loads(r.getMessage()) for r in caplog.records
+            if r.name.startswith('fyyur.slow_queries') and json.loads(r.getMessage())['kind'] == kind]
+
+
+def test_server_timing_counts_statements(client, make_venue):
+    make_venue()
+
+    response = client.get('/venues/1')
+
+    timings = response.headers.getlist('Server-Timing')
+    assert timings[0].startswith('db;desc="3 queries";dur=')
+    assert timings[1].startswith('app;dur=')
+
+
+def test_slow_requests_are_logged_with_their_slowest_statements(app, client, make_venue, caplog):
+    app.config.update(SLOW_REQUEST_DB_SECONDS=0, SQL_TIMING_TOP=2)
+    make_venue()
+
+    with caplog.at_level(logging.WARNING, logger='fyyur.slow_queries'):
+        client.get('/venues/1?x=1')
+
+    [logged] = records(caplog, 'request')
+    assert logged['path'] == '/venues/1?x=1'
+    assert logged['statements'] == 3
+    assert len(logged['slowest']) == 2
+    assert logged['slowest'][0]['duration_ms'] >= logged['slowest'][1]['duration_ms']
+    assert logged['slowest'][0]['statement'].startswith('SELECT')
+
+
+def test_fast_requests_are_not_logged(client, make_venue, caplog):
+    make_venue()
+
+    with caplog.at_level(logging.WARNING, logger='fyyur.slow_queries'):
+        client.get('/venues/1')
+
+    assert records(caplog, 'request') == []
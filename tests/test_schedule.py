@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+from bulk import schedule_shows
+from models import Artist, Show, Venue
+
+
+def when(days):
+    return (datetime.now() + timedelta(days=days)).replace(microsecond=0)
+
+
+def record(venue_id, artist_id, start_time):
+    return {'venue_id': str(venue_id), 'artist_id': str(artist_id),
+            'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S') if start_time else ''}
+
+
+def statuses(results):
+    return [(r['status'], r['error']) for r in results]
+
+
+def test_batch_rejects_invalid_and_unknown_records(make_venue, make_artist):
+    make_venue(), make_artist()
+
+    results = schedule_shows([
+        record(1, 1, when(1)),
+        record('one', 1, when(2)),
+        record(1, 1, None),
+        record(99, 1, when(3)),
+        record(1, 99, when(4)),
+    ], datetime.now())
+
+    assert statuses(results) == [
+        ('created', None),
+        ('invalid', 'venue_id: Not a valid integer.'),
+        ('invalid', 'start_time: This field is required.'),
+        ('unknown', 'venue 99 does not exist'),
+        ('unknown', 'artist 99 does not exist'),
+    ]
+    assert Show.query.count() == 1
+
+
+def test_batch_detects_conflicts(make_venue, make_artist, make_show):
+    venue, artist = make_venue(), make_artist()
+    make_venue('Other Venue'), make_artist('Other Artist')
+    booked = when(1)
+    make_show(venue, artist, booked)
+
+    results = schedule_shows([
+        record(2, 1, booked),
+        record(1, 2, booked),
+        record(2, 2, when(2)),
+        record(2, 1, when(2)),
+        record(1, 2, when(2)),
+    ], datetime.now())
+
+    assert statuses(results) == [
+        ('conflict', 'artist 1 already has a show at this time'),
+        ('conflict', 'venue 1 already has a show at this time'),
+        ('created', None),
+        ('conflict', 'venue 2 already has a show at this time'),
+        ('conflict', 'artist 2 already has a show at this time'),
+    ]
+    assert Show.query.count() == 2
+
+
+def test_batch_updates_show_counters(db, make_venue, make_artist):
+    make_venue(), make_artist()
+    make_venue('Other Venue')
+
+    results = schedule_shows([
+        record(1, 1, when(-1)),
+        record(1, 1, when(1)),
+        record(2, 1, when(2)),
+    ], datetime.now())
+
+    assert [r['status'] for r in results] == ['created'] * 3
+    db.session.expire_all()
+    counters = [(v.upcoming_shows_count, v.past_shows_count) for v in Venue.query.order_by(Venue.id)]
+    assert counters == [(1, 1), (1, 0)]
+    artist = Artist.query.get(1)
+    assert (artist.upcoming_shows_count, artist.past_shows_count) == (2, 1)
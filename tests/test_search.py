@@ -0,0 +1,69 @@
+from models import Venue
+from queries import search_by_name
+
+
+def names(rows):
+    return [row.name for row in rows]
+
+
+def test_search_is_case_insensitive(make_venue):
+    make_venue('The Jazz Bar')
+
+    assert names(search_by_name(Venue, 'jAZZ')) == ['The Jazz Bar']
+
+
+def test_search_escapes_percent(make_venue):
+    make_venue('100% Jazz')
+    make_venue('100 Jazz')
+
+    assert names(search_by_name(Venue, '%')) == ['100% Jazz']
+    assert names(search_by_name(Venue, '100%')) == ['100% Jazz']
+
+
+def test_search_escapes_underscore(make_venue):
+    make_venue('Club_Nine')
+    make_venue('ClubXNine')
+
+    assert names(search_by_name(Venue, 'b_N')) == ['Club_Nine']
+
+
+def test_search_escapes_backslash(make_venue):
+    make_venue('Back\\slash')
+    make_venue('Backslash')
+
+    assert names(search_by_name(Venue, 'k\\s')) == ['Back\\slash']
+
+
+def test_search_returns_at_most_search_limit_rows(app, make_venue):
+    app.config['SEARCH_LIMIT'] = 3
+    for n in range(5):
+        make_venue('Hall %d' % n)
+
+    assert len(search_by_name(Venue, 'hall')) == 3
+
+
+def test_search_ranks_shorter_names_first_without_trigrams(make_venue):
+    make_venue('Jazz Club Downtown')
+    make_venue('The Jazz Bar')
+    make_venue('Jazz')
+    make_venue('Blue Note')
+
+    assert names(search_by_name(Venue, 'jazz')) == ['Jazz', 'The Jazz Bar', 'Jazz Club Downtown']
+
+
+def test_search_breaks_ties_by_name_then_id(make_venue):
+    older = make_venue('Jazz B')
+    make_venue('Jazz A')
+    newer = make_venue('Jazz B')
+
+    rows = search_by_name(Venue, 'jazz')
+
+    assert names(rows) == ['Jazz A', 'Jazz B', 'Jazz B']
+    assert [row.id for row in rows[1:]] == [older.id, newer.id]
+
+
+def test_search_within_a_narrowed_query(make_venue):
+    make_venue('Jazz West', state='CA')
+    make_venue('Jazz East', state='NY')
+
+    assert names(search_by_name(Venue, 'jazz', Venue.query.filter(Venue.state == 'NY'))) == ['Jazz East']
@@ -0,0 +1,48 @@
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from queries import refresh_facet_counts
+
+
+def statements(response):
+    """The number of SQL statements a request issued, from its Server-Timing header."""
+    for value in response.headers.getlist('Server-Timing'):
+        match = re.match(r'db;desc="(\d+) queries"', value)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+@pytest.mark.parametrize('venues', [1, 3, 30])
+def test_venue_directory_statements_do_not_grow_with_venues(client, make_venue, make_artist, make_show, venues):
+    artist = make_artist()
+    for n in range(venues):
+        venue = make_venue('Venue %d' % n, city='City %d' % (n % 7), state=('CA', 'NY', 'TX')[n % 3])
+        make_show(venue, artist, datetime.now() - timedelta(days=n + 1))
+        for day in range(n % 3):
+            make_show(venue, artist, datetime.now() + timedelta(days=day + 1))
+    refresh_facet_counts()
+
+    response = client.get('/venues')
+
+    assert response.status_code == 200
+    # table version, facets version, facet sidebar and the directory page itself
+    assert statements(response) == 4
+    page = response.get_data(as_text=True)
+    for n in range(venues):
+        upcoming = n % 3
+        label = '%d Upcoming %s' % (upcoming, 'Show' if upcoming == 1 else 'Shows')
+        assert re.search(r'<h5>Venue %d</h5>\s*<p>%s</p>' % (n, label), page)
+
+
+def test_venue_directory_groups_venues_by_area(client, make_venue):
+    make_venue('The Musical Hop', city='San Francisco', state='CA')
+    make_venue('Park Square Live Music & Coffee', city='San Francisco', state='CA')
+    make_venue('The Dueling Pianos Bar', city='New York', state='NY')
+
+    page = client.get('/venues').get_data(as_text=True)
+
+    assert page.index('San Francisco') < page.index('The Musical Hop')
+    assert page.index('New York') < page.index('The Dueling Pianos Bar')
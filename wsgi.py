@@ -0,0 +1,20 @@
+"""WSGI entry point for production servers.
+
+Under gunicorn's gevent worker (``gunicorn -k gevent wsgi:app``) the standard
+library is already monkey-patched when this module loads, so psycopg2 is
+patched to wait on the gevent hub too. Each worker can then keep many
+requests in flight while they wait on the database.
+"""
+try:
+    from gevent import monkey
+except ImportError:
+    monkey = None
+
+if monkey is not None and monkey.is_module_patched('socket'):
+    from psycogreen.gevent import patch_psycopg
+
+    patch_psycopg()
+
+from app import create_app
+
+app = create_app()